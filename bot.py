@@ -15,12 +15,12 @@ Features (approved set):
 - Encrypted SQLite (SQLCipher) storage (violations, banned_words, activation, dm_spam, salt_state)
 - DM spam suppression: non-admin DM > threshold (50 default in 7d) → silent group ban + block
 - Status summary without exposing hashed identities
-- Substring + word-boundary banned-word detection (substring kept ON, documented)
+- Single-pass substring banned-word detection (covers exact tokens; substring kept ON, documented)
 
 Security design:
 - If SALT provided: fixed mode (no rotation)
 - If SALT not provided: secure random 32-byte hex salt rotated every 24h (violations & dm_spam reset)
-- Keyed BLAKE2b (digest_size=32) for user_id anonymization
+- Keyed BLAKE2b (digest_size=16, stored as raw BLOB) for user_id anonymization
 - SQLCipher encryption with passphrase DB_PASSPHRASE
 """
 
@@ -28,11 +28,12 @@ import os
 import re
 import logging
 import asyncio
+import threading
 import time
 import secrets
-import sqlite3  # Will be overridden by pysqlcipher3 import below
-from typing import Set, List, Tuple, Dict, Optional
-from datetime import datetime, timedelta
+from typing import Set, FrozenSet, List, Tuple, Dict, Optional
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from pathlib import Path
 
 # SQLCipher driver
@@ -54,15 +55,17 @@ from telethon.errors import (
 from dotenv import load_dotenv
 from hashlib import blake2b
 
-# Auto-generate secure environment variables if missing or invalid
+# Optional: Aho-Corasick automaton for the banned-word substring scan
 try:
-    from env_generator import ensure_secure_environment
-    ensure_secure_environment()
+    import ahocorasick
 except ImportError:
-    # env_generator not available, skip auto-generation
-    pass
+    ahocorasick = None
 
-load_dotenv()
+# Optional: Hyperscan (SIMD multi-pattern matcher) for very large lists / high rates
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
 
 # -----------------------------
 # Data directory
@@ -96,7 +99,18 @@ logging.basicConfig(
     ]
 )
 logger = logging.getLogger("xcontroller")
-logger.info(f"Using data directory: {DATA_DIR}")
+logger.info("Using data directory: %s", DATA_DIR)
+
+# Auto-generate secure environment variables if missing or invalid
+# (after logging setup so env_generator's log records are emitted)
+try:
+    from env_generator import ensure_secure_environment
+    ensure_secure_environment()
+except ImportError:
+    # env_generator not available, skip auto-generation
+    pass
+
+load_dotenv()
 
 # -----------------------------
 # Rate limiting (placeholder)
@@ -106,10 +120,13 @@ class TokenBucket:
         self.capacity = capacity
         self.tokens = capacity
         self.refill_rate = refill_rate
-        self.last_refill = time.time()
+        # Monotonic (wall-clock jumps can't mint or freeze tokens); an
+        # instance attribute so tests can substitute a virtual clock.
+        self._now = time.monotonic
+        self.last_refill = self._now()
 
     async def consume(self, tokens: int = 1) -> bool:
-        now = time.time()
+        now = self._now()
         elapsed = now - self.last_refill
         self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_rate)
         self.last_refill = now
@@ -121,77 +138,195 @@ class TokenBucket:
 # -----------------------------
 # Database Manager (SQLCipher)
 # -----------------------------
+# On-disk schema version (PRAGMA user_version); see DatabaseManager._migrate
+SCHEMA_VERSION = 2
+SECONDS_PER_DAY = 86400
+
 class DatabaseManager:
     """
     Manages encrypted SQLite (SQLCipher) + salted hashing state.
-    Tables:
-      - activation_state(id=1, activated INT, activated_at TEXT)
+    Tables (all timestamps are INTEGER unix seconds, UTC):
+      - activation_state(id=1, activated INT, activated_at INT)
       - banned_words(word TEXT PK)
-      - violations(user_hash PK, count INT, last_violation TEXT)
-      - dm_spam(user_hash PK, count INT, last_seen TEXT, actioned INT)
-      - salt_state(id=1, salt TEXT, last_rotated_at TEXT)   (only if SALT not provided)
+      - violations(user_hash BLOB PK, count INT, last_violation INT)
+      - dm_spam(user_hash BLOB PK, count INT, last_seen INT, actioned INT)
+      - salt_state(id=1, salt TEXT, last_rotated_at INT)   (only if SALT not provided)
+    Indexes:
+      - idx_viol_time(violations.last_violation)
+      - idx_dm_seen(dm_spam.last_seen, dm_spam.actioned)
     """
-    def __init__(self, db_path: Path, db_passphrase: str, initial_salt: Optional[str], rotation_enabled: bool):
+    _TABLES = {
+        "activation_state": """
+            CREATE TABLE IF NOT EXISTS activation_state(
+                id INTEGER PRIMARY KEY CHECK(id=1),
+                activated INTEGER NOT NULL,
+                activated_at INTEGER NOT NULL
+            )""",
+        "banned_words": """
+            CREATE TABLE IF NOT EXISTS banned_words(
+                word TEXT PRIMARY KEY
+            )""",
+        "violations": """
+            CREATE TABLE IF NOT EXISTS violations(
+                user_hash BLOB PRIMARY KEY,
+                count INTEGER DEFAULT 0,
+                last_violation INTEGER
+            )""",
+        "dm_spam": """
+            CREATE TABLE IF NOT EXISTS dm_spam(
+                user_hash BLOB PRIMARY KEY,
+                count INTEGER DEFAULT 0,
+                last_seen INTEGER,
+                actioned INTEGER DEFAULT 0
+            )""",
+        "salt_state": """
+            CREATE TABLE IF NOT EXISTS salt_state(
+                id INTEGER PRIMARY KEY CHECK(id=1),
+                salt TEXT NOT NULL,
+                last_rotated_at INTEGER NOT NULL
+            )""",
+    }
+
+    def __init__(self, db_path: Optional[Path], db_passphrase: str, initial_salt: Optional[str],
+                 rotation_enabled: bool, in_memory: bool = False):
+        # in_memory: private ':memory:' database (tests); db_path is ignored
         self.db_path = db_path
+        self.in_memory = in_memory
         self.db_passphrase = db_passphrase
         self.rotation_enabled = rotation_enabled  # True if SALT not provided (enable daily rotation)
         self.current_salt = initial_salt  # hex string
+        self._conn = None
         self._init_and_load()
 
+    @property
+    def current_salt(self) -> Optional[str]:
+        return self._current_salt
+
+    @current_salt.setter
+    def current_salt(self, salt: Optional[str]):
+        # Hashes are deterministic per salt: memoise them (repeat offenders
+        # and DM spammers hit the same ids), and start a fresh cache whenever
+        # the salt changes so no digest outlives its key.
+        self._current_salt = salt
+        self._salt_key = bytes.fromhex(salt) if salt else None
+        self.hash_user_id = lru_cache(maxsize=8192)(self._hash_user_id)
+
     def _connect(self):
-        conn = sqlcipher.connect(self.db_path)
-        # Apply key
-        conn.execute(f"PRAGMA key='{self.db_passphrase}';")
-        # Optional cipher settings (can adjust page_size/kdf_iter)
-        conn.execute("PRAGMA cipher_page_size = 4096;")
-        conn.execute("PRAGMA kdf_iter = 64000;")
-        conn.execute("PRAGMA cipher_hmac_algorithm = HMAC_SHA512;")
-        conn.execute("PRAGMA cipher_kdf_algorithm = PBKDF2_HMAC_SHA512;")
-        return conn
+        """
+        Return the shared connection, opening and keying it on first use.
+        A single long-lived connection keeps the driver's prepared-statement
+        cache warm (statements are cached by SQL text, so keep SQL literal).
+        """
+        if self._conn is None:
+            conn = sqlcipher.connect(":memory:" if self.in_memory else self.db_path)
+            # Apply key
+            conn.execute(f"PRAGMA key='{self.db_passphrase}';")
+            # Optional cipher settings (can adjust page_size/kdf_iter).
+            # PBKDF2 (kdf_iter rounds) dominates open cost but runs once per
+            # process on this shared connection, so HMAC and kdf_iter stay.
+            conn.execute("PRAGMA cipher_page_size = 4096;")
+            conn.execute("PRAGMA kdf_iter = 64000;")
+            conn.execute("PRAGMA cipher_hmac_algorithm = HMAC_SHA512;")
+            conn.execute("PRAGMA cipher_kdf_algorithm = PBKDF2_HMAC_SHA512;")
+            # WAL + synchronous=NORMAL: commits append to the log without an
+            # fsync each; a power loss may drop the last few writes, never corrupt.
+            # (In-memory databases have no journal file to switch.)
+            if not self.in_memory:
+                conn.execute("PRAGMA journal_mode = WAL;")
+                conn.execute("PRAGMA synchronous = NORMAL;")
+            # Every page read from disk is decrypted; a ~20 MB page cache keeps
+            # the working set decrypted in memory. (mmap_size is no help here:
+            # SQLCipher never memory-maps an encrypted database.)
+            conn.execute("PRAGMA cache_size = -20000;")
+            conn.execute("PRAGMA temp_store = MEMORY;")
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _now() -> int:
+        return int(time.time())
+
+    @staticmethod
+    def _format_ts(ts: int) -> str:
+        # Naive UTC ISO text, as stored before timestamps became integers
+        return datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None).isoformat()
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _migrate(self, cur):
+        """Bring an existing database up to SCHEMA_VERSION before tables are (re)created."""
+        cur.execute("PRAGMA user_version")
+        version = cur.fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+        # SQLite DDL is transactional, but the driver autocommits it: take
+        # manual control so a failed or interrupted upgrade (the version
+        # bump included) rolls back to the old schema instead of leaving
+        # half-renamed tables behind.
+        conn = cur.connection
+        isolation_level = conn.isolation_level
+        conn.isolation_level = None
+        try:
+            cur.execute("BEGIN")
+            try:
+                cur.execute("SELECT name FROM sqlite_master WHERE type='table'")
+                existing = {r[0] for r in cur.fetchall()}
+                if version < 2:
+                    # v1: user_hash hex TEXT -> raw BLOB; v2: ISO text timestamps -> INTEGER.
+                    # Hashed rows are disposable (salt rotation clears them as well), so recreate.
+                    if existing & {"violations", "dm_spam"}:
+                        logger.info("Schema upgrade: recreating violations & dm_spam.")
+                    cur.execute("DROP TABLE IF EXISTS violations")
+                    cur.execute("DROP TABLE IF EXISTS dm_spam")
+                    # Single-row state tables keep their data; column types cannot be
+                    # altered in place, so copy through a renamed table. A legacy
+                    # timestamp that does not parse becomes "now" (NOT NULL column).
+                    for table, columns, ts_col in (
+                        ("activation_state", "id, activated", "activated_at"),
+                        ("salt_state", "id, salt", "last_rotated_at"),
+                    ):
+                        if table not in existing:
+                            continue
+                        cur.execute(f"ALTER TABLE {table} RENAME TO {table}_v1")
+                        cur.execute(self._TABLES[table])
+                        cur.execute(f"""
+                            INSERT INTO {table}({columns}, {ts_col})
+                            SELECT {columns}, COALESCE(CAST(strftime('%s', {ts_col}) AS INTEGER),
+                                                     CAST(strftime('%s', 'now') AS INTEGER))
+                            FROM {table}_v1
+                        """)
+                        cur.execute(f"DROP TABLE {table}_v1")
+                cur.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            except BaseException:
+                cur.execute("ROLLBACK")
+                raise
+            cur.execute("COMMIT")
+        finally:
+            conn.isolation_level = isolation_level
 
     def _init_and_load(self):
         with self._connect() as conn:
             cur = conn.cursor()
+            self._migrate(cur)
             # Core tables
-            cur.execute("""
-            CREATE TABLE IF NOT EXISTS activation_state(
-                id INTEGER PRIMARY KEY CHECK(id=1),
-                activated INTEGER NOT NULL,
-                activated_at TEXT NOT NULL
-            )""")
-            cur.execute("""
-            CREATE TABLE IF NOT EXISTS banned_words(
-                word TEXT PRIMARY KEY
-            )""")
-            cur.execute("""
-            CREATE TABLE IF NOT EXISTS violations(
-                user_hash TEXT PRIMARY KEY,
-                count INTEGER DEFAULT 0,
-                last_violation TEXT
-            )""")
-            cur.execute("""
-            CREATE TABLE IF NOT EXISTS dm_spam(
-                user_hash TEXT PRIMARY KEY,
-                count INTEGER DEFAULT 0,
-                last_seen TEXT,
-                actioned INTEGER DEFAULT 0
-            )""")
+            for table in ("activation_state", "banned_words", "violations", "dm_spam"):
+                cur.execute(self._TABLES[table])
+            # Time indexes for /status aggregates (dm_spam one is covering)
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_viol_time ON violations(last_violation)")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_dm_seen ON dm_spam(last_seen, actioned)")
             # Salt state only needed if rotation enabled
             if self.rotation_enabled:
-                cur.execute("""
-                CREATE TABLE IF NOT EXISTS salt_state(
-                    id INTEGER PRIMARY KEY CHECK(id=1),
-                    salt TEXT NOT NULL,
-                    last_rotated_at TEXT NOT NULL
-                )""")
+                cur.execute(self._TABLES["salt_state"])
                 cur.execute("SELECT salt, last_rotated_at FROM salt_state WHERE id=1")
                 row = cur.fetchone()
                 if row is None:
                     # create new salt
                     gen = secrets.token_hex(32)
-                    now = datetime.utcnow().isoformat()
                     cur.execute("INSERT INTO salt_state(id, salt, last_rotated_at) VALUES (1, ?, ?)",
-                                (gen, now))
+                                (gen, self._now()))
                     self.current_salt = gen
                     logger.info("Initialized rotating salt (first generation).")
                 else:
@@ -203,7 +338,7 @@ class DatabaseManager:
             cur.execute("SELECT activated FROM activation_state WHERE id=1")
             if cur.fetchone() is None:
                 cur.execute("INSERT INTO activation_state(id, activated, activated_at) VALUES (1, 0, ?)",
-                            (datetime.utcnow().isoformat(),))
+                            (self._now(),))
             conn.commit()
 
         if not self.current_salt:
@@ -222,11 +357,11 @@ class DatabaseManager:
             if not row:
                 return False
             old_salt, last_rotated_at = row
-            last_dt = datetime.fromisoformat(last_rotated_at)
-            if datetime.utcnow() - last_dt > timedelta(days=1):
+            now = self._now()
+            if now - last_rotated_at > SECONDS_PER_DAY:
                 new_salt = secrets.token_hex(32)
                 cur.execute("UPDATE salt_state SET salt=?, last_rotated_at=? WHERE id=1",
-                            (new_salt, datetime.utcnow().isoformat()))
+                            (new_salt, now))
                 # Clear data tied to old salt (user_hash becomes obsolete)
                 cur.execute("DELETE FROM violations")
                 cur.execute("DELETE FROM dm_spam")
@@ -245,16 +380,13 @@ class DatabaseManager:
             row = cur.fetchone()
             if not row:
                 return None
-            last_dt = datetime.fromisoformat(row[0])
-            nxt = last_dt + timedelta(days=1)
-            return nxt.isoformat()
+            return self._format_ts(row[0] + SECONDS_PER_DAY)
 
     # -------- Hashing (keyed blake2b) --------
-    def hash_user_id(self, user_id: int) -> str:
-        # Keyed blake2b (digest_size=32)
-        h = blake2b(key=bytes.fromhex(self.current_salt), digest_size=32)
-        h.update(str(user_id).encode())
-        return h.hexdigest()
+    def _hash_user_id(self, user_id: int) -> bytes:
+        # Keyed blake2b (digest_size=16); raw digest is the BLOB primary key.
+        # Called through the per-salt cache bound as self.hash_user_id.
+        return blake2b(str(user_id).encode(), key=self._salt_key, digest_size=16).digest()
 
     # -------- Activation --------
     def is_activated(self) -> bool:
@@ -268,38 +400,49 @@ class DatabaseManager:
         with self._connect() as conn:
             cur = conn.cursor()
             cur.execute("UPDATE activation_state SET activated=1, activated_at=? WHERE id=1",
-                        (datetime.utcnow().isoformat(),))
+                        (self._now(),))
             conn.commit()
 
     def get_activation_row(self) -> Tuple[int, str]:
         with self._connect() as conn:
             cur = conn.cursor()
             cur.execute("SELECT activated, activated_at FROM activation_state WHERE id=1")
-            return cur.fetchone()
+            activated, activated_at = cur.fetchone()
+            return activated, self._format_ts(activated_at)
 
     # -------- Violations --------
     def add_violation(self, user_id: int) -> int:
+        """
+        Record a violation and return the running count. The count restarts
+        at 1 when more than 7 whole days passed since the previous one.
+        """
         user_hash = self.hash_user_id(user_id)
-        now = datetime.utcnow()
+        now = self._now()
         with self._connect() as conn:
             cur = conn.cursor()
-            cur.execute("SELECT count, last_violation FROM violations WHERE user_hash=?", (user_hash,))
-            r = cur.fetchone()
-            current = 0
-            if r:
-                current = r[0]
-                last = datetime.fromisoformat(r[1]) if r[1] else None
-                if last and (now - last).days > 7:
-                    current = 0
-            new_count = current + 1
             cur.execute("""
-                INSERT OR REPLACE INTO violations(user_hash, count, last_violation)
-                VALUES (?, ?, ?)
-            """, (user_hash, new_count, now.isoformat()))
+                INSERT INTO violations(user_hash, count, last_violation) VALUES (?, 1, ?)
+                ON CONFLICT(user_hash) DO UPDATE SET
+                    count = CASE WHEN (excluded.last_violation - last_violation) / 86400 > 7
+                                 THEN 1 ELSE count + 1 END,
+                    last_violation = excluded.last_violation
+                RETURNING count
+            """, (user_hash, now))
+            new_count = cur.fetchall()[0][0]
             conn.commit()
             return new_count
 
+    def _debug_set_violation_time(self, user_id: int, when: int):
+        """Test hook: back-date a user's violation (count back to 1) on the shared connection."""
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.execute("UPDATE violations SET last_violation=?, count=1 WHERE user_hash=?",
+                        (when, self.hash_user_id(user_id)))
+            conn.commit()
+
     # -------- Banned words --------
+    # Invariant: banned words are stored lowercased. Both ingestion paths below
+    # normalise, so readers (and the matcher) never lower words themselves.
     def get_banned_words(self) -> Set[str]:
         with self._connect() as conn:
             cur = conn.cursor()
@@ -320,8 +463,8 @@ class DatabaseManager:
                 try:
                     cur.execute("INSERT INTO banned_words(word) VALUES (?)", (w,))
                     added.append(w)
-                    logger.info(f"Added banned word: {w}")
-                except sqlite3.IntegrityError:
+                    logger.info("Added banned word: %s", w)
+                except sqlcipher.IntegrityError:
                     existing.append(w)
             if added:
                 conn.commit()
@@ -332,8 +475,10 @@ class DatabaseManager:
             return
         with self._connect() as conn:
             cur = conn.cursor()
-            for w in words:
-                cur.execute("INSERT OR IGNORE INTO banned_words(word) VALUES (?)", (w,))
+            cur.executemany(
+                "INSERT OR IGNORE INTO banned_words(word) VALUES (?)",
+                [(w2,) for w2 in {w.strip().lower() for w in words} if w2]
+            )
             conn.commit()
 
     # -------- DM Spam --------
@@ -343,27 +488,20 @@ class DatabaseManager:
         Resets count if last_seen older than window_days.
         """
         user_hash = self.hash_user_id(user_id)
-        now = datetime.utcnow()
+        now = self._now()
         with self._connect() as conn:
             cur = conn.cursor()
-            cur.execute("SELECT count, last_seen, actioned FROM dm_spam WHERE user_hash=?", (user_hash,))
-            r = cur.fetchone()
-            count = 0
-            actioned = False
-            if r:
-                count, last_seen, actioned_flag = r
-                actioned = bool(actioned_flag)
-                if last_seen:
-                    last_dt = datetime.fromisoformat(last_seen)
-                    if (now - last_dt).days > window_days:
-                        count = 0
-            count += 1
             cur.execute("""
-                INSERT OR REPLACE INTO dm_spam(user_hash, count, last_seen, actioned)
-                VALUES (?, ?, ?, ?)
-            """, (user_hash, count, now.isoformat(), 1 if actioned else 0))
+                INSERT INTO dm_spam(user_hash, count, last_seen, actioned) VALUES (?, 1, ?, 0)
+                ON CONFLICT(user_hash) DO UPDATE SET
+                    count = CASE WHEN (excluded.last_seen - last_seen) / 86400 > ?
+                                 THEN 1 ELSE count + 1 END,
+                    last_seen = excluded.last_seen
+                RETURNING count, actioned
+            """, (user_hash, now, window_days))
+            count, actioned = cur.fetchall()[0]
             conn.commit()
-            return count, actioned
+            return count, bool(actioned)
 
     def mark_dm_spam_actioned(self, user_id: int):
         user_hash = self.hash_user_id(user_id)
@@ -374,30 +512,153 @@ class DatabaseManager:
 
     # -------- Aggregates for status --------
     def get_violation_aggregate(self) -> int:
-        now = datetime.utcnow()
-        cutoff = now - timedelta(days=7)
+        cutoff = self._now() - 7 * SECONDS_PER_DAY
         with self._connect() as conn:
             cur = conn.cursor()
-            cur.execute("SELECT COUNT(*) FROM violations WHERE last_violation >= ?", (cutoff.isoformat(),))
+            cur.execute("SELECT COUNT(*) FROM violations WHERE last_violation >= ?", (cutoff,))
             return cur.fetchone()[0]
 
     def get_dm_spam_aggregate(self, window_days: int) -> Dict[str, int]:
-        now = datetime.utcnow()
-        cutoff = now - timedelta(days=window_days)
+        cutoff = self._now() - window_days * SECONDS_PER_DAY
         with self._connect() as conn:
             cur = conn.cursor()
             cur.execute("""
                 SELECT COUNT(*) FROM dm_spam
                 WHERE last_seen >= ? AND actioned=1
-            """, (cutoff.isoformat(),))
+            """, (cutoff,))
             actioned = cur.fetchone()[0]
             cur.execute("""
                 SELECT COUNT(*) FROM dm_spam
                 WHERE last_seen >= ?
-            """, (cutoff.isoformat(),))
+            """, (cutoff,))
             total = cur.fetchone()[0]
         return {"actioned": actioned, "total": total}
 
+# -----------------------------
+# Banned-word matching
+# -----------------------------
+class BannedWordMatcher:
+    """
+    Immutable scanner over a set of banned words, rebuilt whenever the set changes.
+
+    Backends, best available first:
+      - hyperscan: words compiled into one native SIMD matcher
+      - pyahocorasick: single pass over the text (O(len(text))) regardless of list size
+      - one precompiled alternation regex, which still scans in C rather than
+        looping over the words in Python
+    """
+    # Short texts ("ok", "lol", greetings) repeat a lot in group chat; their
+    # verdicts are memoised per matcher, so rebuilding on a word-list change
+    # is also the cache invalidation. Longer texts rarely repeat and would
+    # only bloat the cache.
+    CACHE_SIZE = 4096
+    CACHE_MAX_CHARS = 256
+    # Very short texts against a small list: plain `in` checks beat the
+    # backend call overhead.
+    SHORT_TEXT_CHARS = 16
+    SHORT_LIST_MAX = 32
+
+    def __init__(self, words: Set[str]):
+        # Words arrive lowercased (DatabaseManager ingestion invariant); frozen
+        # so nothing can mutate the set behind the automaton's back.
+        self.words: FrozenSet[str] = frozenset(words)
+        self._hs_db = None
+        self._automaton = None
+        self._regex = None
+        if hyperscan is not None and self.words:
+            self._hs_db = self._compile_hyperscan(self.words)
+            # A scratch space serves one scan at a time: each thread (the event
+            # loop, and the offload workers, see TelegramAdminBot.SCAN_OFFLOAD_CHARS)
+            # clones its own, so a long offloaded scan never blocks the loop.
+            self._hs_local = threading.local()
+        if self._hs_db is None and self.words:
+            if ahocorasick is not None:
+                automaton = ahocorasick.Automaton()
+                for w in self.words:
+                    automaton.add_word(w, w)
+                automaton.make_automaton()
+                self._automaton = automaton
+            else:
+                # Longest-first so overlapping alternatives prefer the fuller word
+                self._regex = re.compile("|".join(
+                    map(re.escape, sorted(self.words, key=len, reverse=True))
+                ))
+        self._search = self._bind_search()
+        # Length-sorted so the fast path can stop at the first word longer than the text
+        self._short_words = (
+            tuple(sorted(self.words, key=len)) if len(self.words) < self.SHORT_LIST_MAX else None
+        )
+        self._scan_cached = lru_cache(maxsize=self.CACHE_SIZE)(self._scan)
+
+    def _bind_search(self):
+        """
+        Pick the backend once, binding its C-level entry point, so a scan is
+        a single call with no per-message backend dispatch or attribute chain.
+        """
+        if self._hs_db is not None:
+            return self._hs_search
+        if self._automaton is not None:
+            ac_iter = self._automaton.iter
+            return lambda lower: next(ac_iter(lower), None) is not None
+        if self._regex is not None:
+            regex_search = self._regex.search
+            return lambda lower: regex_search(lower) is not None
+        return lambda lower: False
+
+    @staticmethod
+    def _compile_hyperscan(words: FrozenSet[str]):
+        ordered = sorted(words)
+        db = hyperscan.Database(mode=hyperscan.HS_MODE_BLOCK)
+        try:
+            db.compile(
+                expressions=[re.escape(w).encode("utf-8", "surrogatepass") for w in ordered],
+                ids=list(range(len(ordered))),
+                elements=len(ordered),
+                flags=[hyperscan.HS_FLAG_SINGLEMATCH] * len(ordered),
+            )
+        except hyperscan.error as e:
+            logger.warning("Hyperscan compile failed, using fallback matcher: %s", e)
+            return None
+        return db
+
+    def _hs_search(self, lower: str) -> bool:
+        hits = []
+
+        def on_match(pattern_id, start, end, flags, context):
+            hits.append(pattern_id)
+            return True  # stop at the first hit
+
+        scratch = getattr(self._hs_local, "scratch", None)
+        if scratch is None:
+            scratch = self._hs_local.scratch = self._hs_db.scratch.clone()
+        try:
+            self._hs_db.scan(lower.encode("utf-8", "surrogatepass"),
+                             match_event_handler=on_match, scratch=scratch)
+        except hyperscan.ScanTerminated:
+            pass
+        return bool(hits)
+
+    def scan(self, lower: str) -> bool:
+        """True if `lower` (already lowercased) contains a banned word."""
+        if len(lower) <= self.CACHE_MAX_CHARS:
+            return self._scan_cached(lower)
+        return self._scan(lower)
+
+    def _scan(self, lower: str) -> bool:
+        # A whole-token match is also a substring match, so one substring
+        # pass covers both; no separate tokenize step.
+        n = len(lower)
+        if not n:
+            return False
+        if n < self.SHORT_TEXT_CHARS and self._short_words is not None:
+            for bw in self._short_words:
+                if len(bw) > n:
+                    break
+                if bw in lower:
+                    return True
+            return False
+        return self._search(lower)
+
 # -----------------------------
 # Telegram Bot
 # -----------------------------
@@ -409,8 +670,33 @@ class TelegramAdminBot:
         "activate (if not active)\n\n"
         "Only configured admin IDs receive responses. Others are ignored silently."
     )
+    # Messages longer than this are scanned in a worker thread (keeps the event loop responsive)
+    SCAN_OFFLOAD_CHARS = 4096
+    # Penalty durations and restriction sets, built once instead of per call
+    MUTE_DEFAULT_HOURS = 12
+    _MUTE_DEFAULT_TD = timedelta(hours=MUTE_DEFAULT_HOURS)
+    # Kick = timed ban that Telegram lifts itself. Bans shorter than 30s are
+    # treated as permanent, so keep a margin above that.
+    _KICK_TD = timedelta(seconds=45)
+    _MUTE_RIGHTS_KWARGS = dict(
+        send_messages=True,
+        send_media=True,
+        send_stickers=True,
+        send_gifs=True,
+        send_games=True,
+        send_inline=True,
+        embed_links=True
+    )
+    # Permanent ban never varies (until_date=None = forever): one shared TL object
+    _BAN_RIGHTS = ChatBannedRights(until_date=None, view_messages=True, **_MUTE_RIGHTS_KWARGS)
+
+    def __init__(self, client_factory=TelegramClient):
+        """client_factory builds the Telegram client (TelegramClient's
+        signature); tests that never touch Telegram pass a stub."""
+        self._matcher = BannedWordMatcher(set())
+        # Strong refs to fire-and-forget tasks (the loop only keeps weak ones)
+        self._bg_tasks: Set[asyncio.Task] = set()
 
-    def __init__(self):
         # Required core env
         self.api_id = os.getenv("API_ID")
         self.api_hash = os.getenv("API_HASH")
@@ -460,12 +746,8 @@ class TelegramAdminBot:
         self.dm_spam_threshold = self._parse_int_env("DM_SPAM_THRESHOLD", 50, min_v=5, max_v=1000)
         self.dm_spam_window_days = self._parse_int_env("DM_SPAM_WINDOW_DAYS", 7, min_v=1, max_v=30)
 
-        # Load initial banned words (if any)
-        env_words = set(
-            w.strip().lower()
-            for w in os.getenv("BANNED_WORDS", "").split(",")
-            if w.strip()
-        )
+        # Load initial banned words (if any); the DB normalises case
+        env_words = {w for w in os.getenv("BANNED_WORDS", "").split(",") if w.strip()}
         if env_words:
             self.db.load_initial_banned_words(env_words)
         self.banned_words = self.db.get_banned_words()
@@ -475,30 +757,48 @@ class TelegramAdminBot:
             logger.info("Bot inactive: awaiting 'activate' admin DM.")
 
         session_path = DATA_DIR / "bot_session"
-        self.client = TelegramClient(str(session_path), int(self.api_id), self.api_hash)
+        self.client = client_factory(str(session_path), int(self.api_id), self.api_hash)
 
         self.rate_limiter = TokenBucket(capacity=10, refill_rate=2.0)
 
         logger.info("Bot initialized with secure configuration.")
 
     # ------------- Helpers -------------
-    def _parse_admin_ids(self) -> Set[int]:
+    def _spawn(self, coro) -> asyncio.Task:
+        """Schedule a background coroutine without awaiting it; the task is
+        held until it finishes so it cannot be garbage-collected mid-flight."""
+        task = asyncio.create_task(coro)
+        self._bg_tasks.add(task)
+        task.add_done_callback(self._bg_tasks.discard)
+        return task
+
+    @property
+    def banned_words(self) -> FrozenSet[str]:
+        return self._matcher.words
+
+    @banned_words.setter
+    def banned_words(self, words: Set[str]):
+        # Swap in a freshly built matcher; a scan running in a worker thread
+        # keeps using the old one until it finishes.
+        self._matcher = BannedWordMatcher(words)
+
+    def _parse_admin_ids(self) -> FrozenSet[int]:
         raw = os.getenv("ADMIN_USER_IDS", "")
         out = set()
         for part in raw.split(","):
             p = part.strip()
             if p.isdigit():
                 out.add(int(p))
-        return out
+        return frozenset(out)
 
     def _parse_int_env(self, name: str, default: int, min_v: int, max_v: int) -> int:
         val_raw = os.getenv(name, str(default)).strip()
         if not val_raw.isdigit():
-            logger.warning(f"{name} invalid; using default {default}")
+            logger.warning("%s invalid; using default %s", name, default)
             return default
         val = int(val_raw)
         if val < min_v or val > max_v:
-            logger.warning(f"{name} out of bounds ({val}); clamping to range {min_v}-{max_v}")
+            logger.warning("%s out of bounds (%s); clamping to range %s-%s", name, val, min_v, max_v)
             val = max(min_v, min(val, max_v))
         return val
 
@@ -515,7 +815,7 @@ class TelegramAdminBot:
         logger.info("Event handlers registered.")
         # Salt rotation background (if enabled)
         if self.rotation_enabled:
-            asyncio.create_task(self.salt_rotation_worker())
+            self._spawn(self.salt_rotation_worker())
             logger.info("Salt rotation worker started (daily).")
 
     async def salt_rotation_worker(self):
@@ -527,7 +827,7 @@ class TelegramAdminBot:
                     self.banned_words = self.db.get_banned_words()
                 await asyncio.sleep(3600)  # check hourly
             except Exception as e:
-                logger.error(f"Salt rotation worker error: {e}")
+                logger.error("Salt rotation worker error: %s", e)
                 await asyncio.sleep(3600)
 
     # ------------- Event Handlers -------------
@@ -555,12 +855,12 @@ class TelegramAdminBot:
                         continue
                     # ENFORCE_USERNAME: Always enabled (hardcoded enforcement)
                     if not getattr(user, "username", None):
-                        logger.info(f"Kicking user {user.id} (no username)")
+                        logger.info("Kicking user %s (no username)", user.id)
                         await self.kick_user(event.chat_id, user_id)
                 except Exception as ex:
-                    logger.error(f"Join processing error for {user_id}: {ex}")
+                    logger.error("Join processing error for %s: %s", user_id, ex)
         except Exception as e:
-            logger.error(f"Error in handle_chat_actions: {e}")
+            logger.error("Error in handle_chat_actions: %s", e)
 
     async def handle_new_message(self, event):
         if not event.is_private and event.chat_id != self.allowed_group_id:
@@ -573,7 +873,7 @@ class TelegramAdminBot:
                 return
             await self._moderate_message(event)
         except Exception as e:
-            logger.error(f"Error in handle_new_message: {e}")
+            logger.error("Error in handle_new_message: %s", e)
 
     async def handle_message_edit(self, event):
         # Edited messages in allowed group must be re-scanned
@@ -586,25 +886,34 @@ class TelegramAdminBot:
                 return
             await self._moderate_message(event, edited=True)
         except Exception as e:
-            logger.error(f"Error in handle_message_edit: {e}")
+            logger.error("Error in handle_message_edit: %s", e)
 
     # ------------- Moderation Core -------------
     async def _moderate_message(self, event, edited: bool = False):
-        # Combine text and (optional) caption if any (Telethon raw_text usually covers)
-        text = event.raw_text or ""
+        # Media/service messages carry no text: bail out before any other work.
+        # (Telethon raw_text covers message text and media captions.)
+        text = getattr(event, "raw_text", None)
         if not text:
             return
-        # Refresh banned words (simple approach)
-        self.banned_words = self.db.get_banned_words()
-        if self.contains_banned_words(text):
+        # self.banned_words is kept current by /orwell; no per-message DB read.
+        # Lowercase once; the scan below works on the lowered copy. Kept as
+        # str.lower() (matching how words are stored): casefold() would diverge
+        # from the stored forms (e.g. 'ß' -> 'ss'), and an ASCII-bytes fast path
+        # still copies the text while dropping non-ASCII characters.
+        lower = text.lower()
+        if len(lower) > self.SCAN_OFFLOAD_CHARS:
+            matched = await asyncio.to_thread(self._contains_banned_lower, lower)
+        else:
+            matched = self._contains_banned_lower(lower)
+        if matched:
             user_id = self._extract_user_id(event)
             if user_id is None:
                 return
-            logger.info(f"Banned content ({'edited' if edited else 'new'}) from user {user_id}; deleting.")
+            logger.info("Banned content (%s) from user %s; deleting.", "edited" if edited else "new", user_id)
             try:
                 await event.delete()
             except Exception as e:
-                logger.error(f"Failed to delete offending message: {e}")
+                logger.error("Failed to delete offending message: %s", e)
             violation_count = self.db.add_violation(user_id)
             if violation_count == 1:
                 await self._first_violation_action(event, user_id)
@@ -612,19 +921,19 @@ class TelegramAdminBot:
                 await self._second_violation_action(event, user_id)
 
     async def _first_violation_action(self, event, user_id: int):
-        logger.info(f"First violation -> mute 12h: user {user_id}")
+        logger.info("First violation -> mute 12h: user %s", user_id)
         await self.mute_user(event.chat_id, user_id, hours=12)
         try:
             warn = await event.respond(
                 "⚠️ Banned content removed. You are muted for 12h. Second violation within 7 days => permanent ban.",
                 reply_to=event.message.id if event.message else None
             )
-            asyncio.create_task(self.delete_after_delay(warn, 30))
+            self._spawn(self.delete_after_delay(warn, 30))
         except Exception as e:
-            logger.error(f"Warning message failed: {e}")
+            logger.error("Warning message failed: %s", e)
 
     async def _second_violation_action(self, event, user_id: int):
-        logger.info(f"Second violation -> permanent ban: user {user_id}")
+        logger.info("Second violation -> permanent ban: user %s", user_id)
         await self.ban_user(event.chat_id, user_id)
 
     # ------------- Private DM Handling -------------
@@ -633,7 +942,7 @@ class TelegramAdminBot:
         if user_id is None:
             return
 
-        # Non-admin DM spam tracking
+        # Non-admin DM spam tracking (admin check first: admins are never hashed/recorded)
         if user_id not in self.admin_ids:
             await self._handle_dm_spam(user_id)
             return
@@ -649,7 +958,7 @@ class TelegramAdminBot:
             else:
                 self.db.set_activated()
                 self._active_cache = True
-                logger.info(f"Activated by admin {user_id}")
+                logger.info("Activated by admin %s", user_id)
                 await self.safe_reply(event, "Activated.")
             return
 
@@ -670,17 +979,17 @@ class TelegramAdminBot:
     async def _handle_dm_spam(self, user_id: int):
         count, actioned = self.db.record_dm(user_id, self.dm_spam_window_days)
         if not actioned and count > self.dm_spam_threshold:
-            logger.info(f"DM spam threshold exceeded by user {user_id}; banning from allowed group and blocking.")
+            logger.info("DM spam threshold exceeded by user %s; banning from allowed group and blocking.", user_id)
             # Ban from allowed group only (single-group design)
             try:
                 await self.ban_user(self.allowed_group_id, user_id)
             except Exception as e:
-                logger.error(f"Failed banning spammer {user_id}: {e}")
+                logger.error("Failed banning spammer %s: %s", user_id, e)
             # Block user
             try:
                 await self.client(functions.contacts.BlockRequest(user_id))
             except Exception as e:
-                logger.error(f"Failed blocking user {user_id}: {e}")
+                logger.error("Failed blocking user %s: %s", user_id, e)
             self.db.mark_dm_spam_actioned(user_id)
 
     # ------------- Commands -------------
@@ -695,7 +1004,10 @@ class TelegramAdminBot:
             await self.safe_reply(event, "No valid words provided.")
             return
         added, existing = self.db.add_banned_words(tokens)
-        self.banned_words = self.db.get_banned_words()
+        if added:
+            # One matcher rebuild per command (all words of a multi-add at once),
+            # extending the in-memory set rather than re-reading the table.
+            self.banned_words = self.banned_words | frozenset(added)
         segs = []
         if added:
             segs.append("Added: " + ", ".join(added))
@@ -723,7 +1035,7 @@ class TelegramAdminBot:
             f"- DM Spam total (window): {spam_stats['total']} | Actioned: {spam_stats['actioned']}\n"
             f"- Salt mode: {salt_mode}\n"
             f"- Next rotation (UTC): {next_rot}\n"
-            f"- Hash function: keyed blake2b/256\n"
+            f"- Hash function: keyed blake2b/128\n"
             f"- Substring scan: ENABLED\n"
         )
         await self.safe_reply(event, msg)
@@ -758,97 +1070,80 @@ class TelegramAdminBot:
         try:
             await event.reply(text)
         except Exception as e:
-            logger.error(f"Reply failed: {e}")
+            logger.error("Reply failed: %s", e)
 
     def contains_banned_words(self, text: str) -> bool:
         """
-        Detection:
-          1. Token scan (word boundary) – exact tokens
-          2. Substring scan – any banned word as substring inside the text (aggressive)
+        Detection: substring scan – any banned word anywhere inside the text (aggressive).
+        An exact token is just the narrowest substring, so it needs no separate pass.
         Substring reasoning: catches attempts like splitting punctuation or adding suffix/prefix.
         False positives possible (e.g. 'classical' contains 'ass').
         """
-        if not text or not self.banned_words:
+        if not text:
             return False
-        lower = text.lower()
-        # Word-boundary tokens
-        tokens = re.findall(r"\b\w+\b", lower)
-        for t in tokens:
-            if t in self.banned_words:
-                return True
-        # Substring fallback
-        for bw in self.banned_words:
-            if bw in lower:
-                return True
-        return False
-
-    async def mute_user(self, chat_id: int, user_id: int, hours: int = 12):
+        return self._contains_banned_lower(text.lower())
+
+    def _contains_banned_lower(self, lower: str) -> bool:
+        """contains_banned_words() for text the caller has already lowercased."""
+        return self._matcher.scan(lower)
+
+    async def _edit_banned(self, chat_id: int, user_id: int, rights: ChatBannedRights):
+        # client.edit_permissions() takes per-flag kwargs (its third positional
+        # is until_date), so prebuilt rights objects go out as the raw request.
+        await self.client(functions.channels.EditBannedRequest(
+            channel=chat_id,
+            participant=user_id,
+            banned_rights=rights
+        ))
+
+    async def mute_user(self, chat_id: int, user_id: int, hours: int = MUTE_DEFAULT_HOURS):
         try:
-            until = datetime.utcnow() + timedelta(hours=hours)
-            rights = ChatBannedRights(
-                until_date=until,
-                send_messages=True,
-                send_media=True,
-                send_stickers=True,
-                send_gifs=True,
-                send_games=True,
-                send_inline=True,
-                embed_links=True
-            )
-            await self.client.edit_permissions(chat_id, user_id, rights)
+            td = self._MUTE_DEFAULT_TD if hours == self.MUTE_DEFAULT_HOURS else timedelta(hours=hours)
+            until = datetime.now(timezone.utc) + td
+            rights = ChatBannedRights(until_date=until, **self._MUTE_RIGHTS_KWARGS)
+            await self._edit_banned(chat_id, user_id, rights)
         except (ChatAdminRequiredError, UserAdminInvalidError):
-            logger.error(f"Missing admin perms to mute {user_id}")
+            logger.error("Missing admin perms to mute %s", user_id)
         except FloodWaitError as e:
-            logger.warning(f"Flood wait {e.seconds}s muting {user_id}")
+            logger.warning("Flood wait %ss muting %s", e.seconds, user_id)
             await asyncio.sleep(e.seconds)
         except Exception as e:
-            logger.error(f"Mute error {user_id}: {e}")
+            logger.error("Mute error %s: %s", user_id, e)
 
     async def delete_after_delay(self, message, delay_seconds: int):
         try:
             await asyncio.sleep(delay_seconds)
             await message.delete()
         except Exception as e:
-            logger.error(f"Ephemeral delete failed: {e}")
+            logger.error("Ephemeral delete failed: %s", e)
 
     async def kick_user(self, chat_id: int, user_id: int):
         try:
             rights = ChatBannedRights(
-                until_date=datetime.utcnow() + timedelta(seconds=30),
+                until_date=datetime.now(timezone.utc) + self._KICK_TD,
                 view_messages=True
             )
-            await self.client.edit_permissions(chat_id, user_id, rights)
-            await asyncio.sleep(1)
-            await self.client.edit_permissions(chat_id, user_id, None)
+            # Single RPC: the ban expires server-side and the user may rejoin
+            # after ~45s, so no follow-up unban (and no sleep) is needed.
+            await self._edit_banned(chat_id, user_id, rights)
         except (ChatAdminRequiredError, UserAdminInvalidError):
-            logger.error(f"Missing admin perms to kick {user_id}")
+            logger.error("Missing admin perms to kick %s", user_id)
         except FloodWaitError as e:
-            logger.warning(f"Flood wait {e.seconds}s kicking {user_id}")
+            logger.warning("Flood wait %ss kicking %s", e.seconds, user_id)
             await asyncio.sleep(e.seconds)
         except Exception as e:
-            logger.error(f"Kick error {user_id}: {e}")
+            logger.error("Kick error %s: %s", user_id, e)
 
     async def ban_user(self, chat_id: int, user_id: int):
         try:
-            rights = ChatBannedRights(
-                until_date=None,
-                view_messages=True,
-                send_messages=True,
-                send_media=True,
-                send_stickers=True,
-                send_gifs=True,
-                send_games=True,
-                send_inline=True,
-                embed_links=True
-            )
-            await self.client.edit_permissions(chat_id, user_id, rights)
+            await self._edit_banned(chat_id, user_id, self._BAN_RIGHTS)
         except (ChatAdminRequiredError, UserAdminInvalidError):
-            logger.error(f"Missing admin perms to ban {user_id}")
+            logger.error("Missing admin perms to ban %s", user_id)
         except FloodWaitError as e:
-            logger.warning(f"Flood wait {e.seconds}s banning {user_id}")
+            logger.warning("Flood wait %ss banning %s", e.seconds, user_id)
             await asyncio.sleep(e.seconds)
         except Exception as e:
-            logger.error(f"Ban error {user_id}: {e}")
+            logger.error("Ban error %s: %s", user_id, e)
 
     async def run(self):
         await self.start()
@@ -864,7 +1159,7 @@ async def main():
     except KeyboardInterrupt:
         logger.info("Bot stopped by user")
     except Exception as e:
-        logger.error(f"Fatal error: {e}")
+        logger.error("Fatal error: %s", e)
 
 if __name__ == "__main__":
     asyncio.run(main())
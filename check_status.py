@@ -4,10 +4,27 @@ XController Bot Status Checker
 Validates configuration and checks if the bot can start
 """
 
+import logging
 import os
 import sys
+from functools import lru_cache
 from dotenv import load_dotenv
 
+_GENERATOR = None
+
+def _get_generator():
+    """Shared EnvGenerator, built on first use. Raises ImportError if env_generator is unavailable."""
+    global _GENERATOR
+    if _GENERATOR is None:
+        from env_generator import EnvGenerator
+        _GENERATOR = EnvGenerator()
+    return _GENERATOR
+
+@lru_cache(maxsize=256)
+def _is_invalid(var_name, value):
+    """Memoised EnvGenerator.is_value_invalid (pure in its arguments)."""
+    return _get_generator().is_value_invalid(var_name, value)
+
 def check_environment():
     """Check if all required environment variables are set"""
     print("🔍 Checking environment configuration...")
@@ -39,12 +56,9 @@ def check_environment():
     
     # Check security-critical variables using env_generator logic
     try:
-        from env_generator import EnvGenerator
-        generator = EnvGenerator()
-        
         # Check DB_PASSPHRASE
         db_passphrase = os.getenv('DB_PASSPHRASE', '')
-        if generator.is_value_invalid('DB_PASSPHRASE', db_passphrase):
+        if _is_invalid('DB_PASSPHRASE', db_passphrase):
             print("⚠️  DB_PASSPHRASE should be replaced with a secure value")
         else:
             print("✅ DB_PASSPHRASE configured securely")
@@ -52,7 +66,7 @@ def check_environment():
         # Check SALT
         salt = os.getenv('SALT', '')
         if salt:
-            if generator.is_value_invalid('SALT', salt):
+            if _is_invalid('SALT', salt):
                 print("⚠️  SALT should be a valid hex string (at least 32 characters)")
             else:
                 print("✅ SALT configured with secure value")
@@ -101,12 +115,35 @@ def check_dependencies():
     
     return True
 
+def _pyc_matches_source(source_path):
+    """True if the __pycache__ .pyc was compiled from this exact source.
+
+    Mirrors importlib's check: the header must carry the current magic
+    number, timestamp-based flags and the source's mtime and size.
+    """
+    import importlib.util
+    try:
+        with open(importlib.util.cache_from_source(source_path), 'rb') as f:
+            header = f.read(16)
+        st = os.stat(source_path)
+    except OSError:
+        return False
+    if len(header) < 16 or header[:4] != importlib.util.MAGIC_NUMBER:
+        return False
+    if int.from_bytes(header[4:8], 'little') != 0:
+        return False
+    return (int.from_bytes(header[8:12], 'little') == int(st.st_mtime) & 0xFFFFFFFF
+            and int.from_bytes(header[12:16], 'little') == st.st_size & 0xFFFFFFFF)
+
 def check_bot_syntax():
     """Check if bot.py has valid syntax"""
     print("\n🔧 Checking bot syntax...")
     
     try:
         import py_compile
+        if _pyc_matches_source('bot.py'):
+            print("✅ Bot syntax is valid (cached)")
+            return True
         py_compile.compile('bot.py', doraise=True)
         print("✅ Bot syntax is valid")
         return True
@@ -119,6 +156,8 @@ def check_bot_syntax():
 
 def main():
     """Run all checks"""
+    # Surface env_generator's progress messages in order with our own output
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stdout)
     print("XController Bot Status Checker")
     print("=" * 50)
     
@@ -0,0 +1,44 @@
+"""
+pytest glue so every test_*.py runs in one session (`python -m pytest`)
+while each file keeps its own `python test_x.py` driver.
+
+The test functions predate pytest: some are coroutines and some report
+failure by returning False instead of raising. pytest_pyfunc_call below
+runs coroutines on a fresh event loop and turns a False return into a
+failure, so no test needs rewriting.
+"""
+
+import asyncio
+import inspect
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from testutils import TEST_ENV
+
+# Baseline configuration TelegramAdminBot needs; tests override per case
+BOT_ENV = {key: value for key, value in TEST_ENV.items() if key != "BANNED_WORDS"}
+
+
+@pytest.fixture(scope="session", autouse=True)
+def bot_env():
+    """Apply BOT_ENV once for the session (keeping anything already set)."""
+    with pytest.MonkeyPatch.context() as mp:
+        for key, value in BOT_ENV.items():
+            if key not in os.environ:
+                mp.setenv(key, value)
+        yield
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_pyfunc_call(pyfuncitem):
+    kwargs = {name: pyfuncitem.funcargs[name] for name in pyfuncitem._fixtureinfo.argnames}
+    result = pyfuncitem.obj(**kwargs)
+    if inspect.iscoroutine(result):
+        result = asyncio.run(result)
+    if result is False:
+        pytest.fail(f"{pyfuncitem.name} reported failure")
+    return True
@@ -3,6 +3,7 @@
 Demonstration of the environment variable auto-generation feature
 """
 
+import logging
 import os
 import sys
 import tempfile
@@ -86,7 +87,7 @@ DM_SPAM_WINDOW_DAYS=7
                         elif key == 'SALT':
                             if value and len(value) == 64:
                                 try:
-                                    int(value, 16)
+                                    bytes.fromhex(value)
                                     print(f"✅ {key}: Generated secure 64-character hex value")
                                 except ValueError:
                                     print(f"⚠️  {key}: Generated value is not valid hex")
@@ -156,6 +157,8 @@ def demo_detection_logic():
 
 def main():
     """Run the demonstration."""
+    # Show env_generator's progress messages inline with the demo output
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stdout)
     try:
         # Run the main demo
         success = demo_auto_generation()
@@ -50,10 +50,9 @@ def demo_features():
     # Demo dynamic banned words management
     print("\n3️⃣ DYNAMIC BANNED WORDS MANAGEMENT")
     print("   Adding new words...")
-    bot.db.add_banned_word("newbadword")
-    bot.db.add_banned_word("anotherbad")
+    bot.db.add_banned_words(["newbadword", "anotherbad"])
     
-    # Refresh bot's word list
+    # Refresh bot's word list (one matcher rebuild for the whole batch)
     bot.banned_words = bot.db.get_banned_words()
     print(f"   ✅ Total words now: {len(bot.banned_words)}")
     print(f"   📝 Updated list: {sorted(bot.banned_words)}")
@@ -75,7 +74,7 @@ def demo_features():
     # Simulate old violation (manual database update)
     import sqlite3
     user_hash = bot.db.hash_user_id(user_id)
-    old_date = datetime.now() - timedelta(days=8)
+    old_date = int((datetime.now() - timedelta(days=8)).timestamp())
     
     db_path = bot.db.db_path
     with sqlite3.connect(db_path) as conn:
@@ -6,35 +6,64 @@ This module automatically generates secure values for important environment vari
 when they are missing or contain placeholder/invalid values.
 """
 
+import logging
 import os
 import secrets
-import re
+import shutil
+import string
+import sys
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Optional, Set
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Bound once at import; the SECURE_VARS generators call these directly
+_token_urlsafe = secrets.token_urlsafe
+_token_hex = secrets.token_hex
+
+# str.translate table that deletes hex digits (SALT validation)
+_HEX_DIGITS_DELETE = str.maketrans('', '', string.hexdigits)
 
 
 class EnvGenerator:
     """Generates and manages secure environment variables."""
     
     # Placeholder values that should be replaced
-    INVALID_VALUES = {
+    INVALID_VALUES = frozenset({
         'change_this_to_a_strong_random_passphrase',
         'your_api_hash_here',
         'your_bot_token_here',
         '1234567890:AA...your_bot_token_here',
         'strongpassphrase',
         '',
-    }
+    })
+    
+    # I/O buffer for .env reads/writes. Gains over the default plateau around
+    # 16-20 KiB; 64 KiB keeps any realistic .env to a single read/write call.
+    IO_BUFFER_SIZE = 64 * 1024
+    
+    # Characters accepted in a .env key (lines with any other key are skipped)
+    KEY_CHARS = frozenset(string.ascii_letters + string.digits + '_.-')
     
-    # Environment variables that need secure generation
+    # Environment variables that need secure generation. 'validator' receives
+    # the stripped, non-placeholder value and returns True if it is usable.
     SECURE_VARS = {
         'DB_PASSPHRASE': {
-            'generator': lambda: secrets.token_urlsafe(32),
+            'generator': lambda: _token_urlsafe(32),
+            # At least 16 characters for security
+            'validator': lambda v: len(v) >= 16,
             'description': 'SQLCipher database encryption passphrase',
             'required': True,
         },
         'SALT': {
-            'generator': lambda: secrets.token_hex(32),
+            'generator': lambda: _token_hex(32),
+            # Valid hex (even length, decodable by bytes.fromhex the way the
+            # bot keys BLAKE2b), at least 32 characters (16 bytes). Length
+            # tests first; translate() deletes every hex digit in one C scan,
+            # so anything left over is a non-hex character.
+            'validator': lambda v: (len(v) >= 32 and not len(v) % 2
+                                    and not v.translate(_HEX_DIGITS_DELETE)),
             'description': 'Fixed salt for user ID hashing (64 hex chars)',
             'required': False,  # Optional - if missing, bot uses rotating salt
         },
@@ -49,6 +78,10 @@ class EnvGenerator:
         self.env_file_path = env_file_path or Path('.env')
         self.current_values = {}
         self.generated_values = {}
+        # Parsed .env from the last load, keyed by _stat_stamp():
+        # unchanged file -> no re-read or re-parse
+        self._parsed_cache = None
+        self._parsed_stamp = None
         
     def load_env_file(self) -> Dict[str, str]:
         """Load current values from .env file.
@@ -56,41 +89,76 @@ class EnvGenerator:
         Returns:
             Dictionary of environment variable key-value pairs.
         """
-        env_values = {}
-        
-        if not self.env_file_path.exists():
-            print(f"⚠️  No .env file found at {self.env_file_path}")
-            return env_values
+        stamp = self._stat_stamp()
+        if stamp is None:
+            logger.warning("⚠️  No .env file found at %s", self.env_file_path)
+            return {}
+        if self._parsed_cache is not None and stamp == self._parsed_stamp:
+            self.current_values = dict(self._parsed_cache)
+            return self.current_values
             
         try:
-            with open(self.env_file_path, 'r', encoding='utf-8') as f:
-                for line_num, line in enumerate(f, 1):
-                    line = line.strip()
-                    
-                    # Skip comments and empty lines
-                    if not line or line.startswith('#'):
-                        continue
-                        
-                    # Parse KEY=VALUE format
-                    if '=' in line:
-                        key, value = line.split('=', 1)
-                        key = key.strip()
-                        value = value.strip()
-                        
-                        # Remove quotes if present
-                        if value.startswith('"') and value.endswith('"'):
-                            value = value[1:-1]
-                        elif value.startswith("'") and value.endswith("'"):
-                            value = value[1:-1]
-                            
-                        env_values[key] = value
-                        
+            # Raw bytes through one large buffer; the parse is shared by content
+            with open(self.env_file_path, 'rb', buffering=self.IO_BUFFER_SIZE) as raw:
+                _, items = _parse_env_bytes(raw.read())
         except Exception as e:
-            print(f"❌ Error reading .env file: {e}")
+            logger.error("❌ Error reading .env file: %s", e)
+            items = ()
+            stamp = None  # don't cache a failed read
+        
+        env_values = dict(items)
+        self._parsed_cache = env_values
+        self._parsed_stamp = stamp
+        self.current_values = dict(env_values)
+        return self.current_values
+    
+    @classmethod
+    def _parse_env_text(cls, data: str) -> Dict[str, str]:
+        """Parse .env text (line endings already normalised) into a dict."""
+        env_values = {}
+        # Single-buffer scan: str.find locates line and '=' boundaries in C
+        # instead of per-line iteration + split. Keys are interned so dict
+        # lookups against SECURE_VARS' (compile-time interned) names match
+        # by identity.
+        key_chars = cls.KEY_CHARS
+        intern = sys.intern
+        i, n = 0, len(data)
+        while i < n:
+            nl = data.find('\n', i)
+            if nl == -1:
+                nl = n
+            line = data[i:nl].strip()
+            i = nl + 1
+            
+            # Skip comments, empty lines and lines without '='
+            if not line or line[0] == '#':
+                continue
+            eq = line.find('=')
+            if eq == -1:
+                continue
+                
+            key = line[:eq].strip()
+            if not key or not key_chars.issuperset(key):
+                continue
+            key = intern(key)
+            value = line[eq + 1:].strip()
             
-        self.current_values = env_values
+            # Remove matching surrounding quotes if present
+            q = value[:1]
+            if q in ('"', "'") and value[-1:] == q:
+                value = value[1:-1]
+                
+            env_values[key] = value
         return env_values
     
+    def _stat_stamp(self):
+        """(inode, mtime_ns, size) of the .env file, or None if it does not exist."""
+        try:
+            st = self.env_file_path.stat()
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+    
     def is_value_invalid(self, key: str, value: str) -> bool:
         """Check if a value is invalid and needs generation.
         
@@ -101,48 +169,46 @@ class EnvGenerator:
         Returns:
             True if value should be regenerated
         """
-        if not value or value.strip() == '':
-            return True
-            
-        # Check against known placeholder values
-        if value.strip() in self.INVALID_VALUES:
+        # Strip once; the bot strips these values the same way on read
+        v = value.strip() if value else ''
+        
+        # Empty or a known placeholder value
+        if not v or v in self.INVALID_VALUES:
             return True
             
-        # Additional checks for specific variables
-        if key == 'DB_PASSPHRASE':
-            # Should be at least 16 characters for security
-            if len(value) < 16:
-                return True
-                
-        elif key == 'SALT':
-            # Should be valid hex and at least 32 characters (16 bytes)
-            if len(value) < 32:
-                return True
-            try:
-                int(value, 16)  # Check if valid hex
-            except ValueError:
-                return True
-                
-        return False
+        # Variable-specific checks via the SECURE_VARS dispatch table
+        config = self.SECURE_VARS.get(key)
+        validator = config.get('validator') if config else None
+        return validator is not None and not validator(v)
     
-    def generate_missing_values(self) -> Dict[str, str]:
+    def generate_missing_values(self, defer: bool = False) -> Dict[str, str]:
         """Generate secure values for missing or invalid environment variables.
         
+        Args:
+            defer: If True, return each variable's generator callable instead of
+                calling it; update_env_file resolves them just before writing.
+        
         Returns:
-            Dictionary of newly generated values.
+            Dictionary of newly generated values (or their generators).
         """
         generated = {}
         current_env = self.load_env_file()
+        is_invalid = self.is_value_invalid
+        environ = os.environ
         
         for var_name, config in self.SECURE_VARS.items():
             current_value = current_env.get(var_name, '')
             
-            if self.is_value_invalid(var_name, current_value):
-                new_value = config['generator']()
-                generated[var_name] = new_value
-                print(f"🔐 Generated secure {var_name}: {config['description']}")
+            if not is_invalid(var_name, current_value):
+                logger.info("✅ %s already configured securely", var_name)
+            elif not is_invalid(var_name, environ.get(var_name, '')):
+                # Already valid in the process env (set earlier in this process
+                # or injected by the deployment): reuse instead of regenerating
+                logger.info("✅ %s already configured securely (environment)", var_name)
             else:
-                print(f"✅ {var_name} already configured securely")
+                generator = config['generator']
+                generated[var_name] = generator if defer else generator()
+                logger.info("🔐 Generated secure %s: %s", var_name, config['description'])
                 
         self.generated_values = generated
         return generated
@@ -151,7 +217,9 @@ class EnvGenerator:
         """Update .env file with new values.
         
         Args:
-            new_values: Dictionary of environment variables to add/update
+            new_values: Dictionary of environment variables to add/update.
+                Callable values are called once the existing file has been
+                read, and new_values is updated in place with the results.
             
         Returns:
             True if update was successful
@@ -160,43 +228,82 @@ class EnvGenerator:
             return True
             
         try:
-            # Read existing content
-            existing_content = []
-            if self.env_file_path.exists():
-                with open(self.env_file_path, 'r', encoding='utf-8') as f:
-                    existing_content = f.readlines()
+            # Always re-read: rewriting from a cached copy could drop an
+            # external edit that kept the file's size and mtime
+            try:
+                with open(self.env_file_path, 'rb', buffering=self.IO_BUFFER_SIZE) as raw:
+                    raw_text, items = _parse_env_bytes(raw.read())
+            except FileNotFoundError:
+                raw_text, items = '', ()
+            
+            # Every key already holds this value: nothing to rewrite
+            current = dict(items)
+            if all(current.get(k) == v for k, v in new_values.items()):
+                return True
+            
+            # Resolve deferred generators only now that the file is readable
+            for key, value in new_values.items():
+                if callable(value):
+                    new_values[key] = value()
+            
+            existing_lines = raw_text.splitlines(keepends=True)
             
             # Track which variables we've updated
             updated_vars = set()
+            out = []
             
             # Update existing lines
-            for i, line in enumerate(existing_content):
+            for line in existing_lines:
                 stripped = line.strip()
-                if not stripped or stripped.startswith('#'):
-                    continue
-                    
-                if '=' in stripped:
-                    key = stripped.split('=', 1)[0].strip()
+                eq = stripped.find('=')
+                if eq > 0 and stripped[0] != '#':
+                    key = stripped[:eq].strip()
                     if key in new_values:
-                        existing_content[i] = f"{key}={new_values[key]}\n"
+                        line = f"{key}={new_values[key]}\n"
                         updated_vars.add(key)
+                out.append(line)
             
-            # Add new variables that weren't found
+            # Add new variables that weren't found (after a final newline)
+            if out and out[-1][-1:] != '\n':
+                out.append('\n')
             for key, value in new_values.items():
                 if key not in updated_vars:
-                    existing_content.append(f"{key}={value}\n")
+                    out.append(f"{key}={value}\n")
             
-            # Write back to file
-            with open(self.env_file_path, 'w', encoding='utf-8') as f:
-                f.writelines(existing_content)
+            self._write_atomic(''.join(out))
+            
+            # File changed under the parse cache
+            self._parsed_cache = None
                 
-            print(f"📝 Updated .env file with {len(new_values)} secure values")
+            logger.info("📝 Updated .env file with %s secure values", len(new_values))
             return True
             
         except Exception as e:
-            print(f"❌ Error updating .env file: {e}")
+            logger.error("❌ Error updating .env file: %s", e)
             return False
     
+    def _write_atomic(self, content: str):
+        """Replace the .env file in one step: write a sibling temp file, fsync
+        it, then os.replace() it over the original. Readers see either the old
+        or the new file, never a partial write."""
+        # Replace the file a symlinked .env points at, not the link itself;
+        # the temp file sits beside the target so os.replace stays on one fs.
+        path = self.env_file_path.resolve()
+        tmp_path = path.with_name(path.name + '.tmp')
+        # Secrets: a new file is owner-only; an existing one keeps its mode
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            with open(fd, 'w', encoding='utf-8', buffering=self.IO_BUFFER_SIZE) as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            if path.exists():
+                shutil.copymode(path, tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+    
     def ensure_secure_environment(self) -> bool:
         """Ensure all important environment variables have secure values.
         
@@ -205,30 +312,51 @@ class EnvGenerator:
         Returns:
             True if all required variables are now secure
         """
-        print("🔍 Checking environment variables for security...")
+        logger.info("🔍 Checking environment variables for security...")
+        
+        # Fast path: process environment already holds valid values for every
+        # secure variable (e.g. injected by Docker) -> no .env read or write.
+        if not any(self.is_value_invalid(name, os.environ.get(name, ''))
+                   for name in self.SECURE_VARS):
+            logger.info("✅ All environment variables are already secure")
+            return True
         
-        # Generate any missing/invalid values
-        generated = self.generate_missing_values()
+        # Find missing/invalid values; generation is deferred to the write
+        generated = self.generate_missing_values(defer=True)
         
         if generated:
-            print(f"🔧 Auto-generating {len(generated)} secure environment values...")
+            logger.info("🔧 Auto-generating %s secure environment values...", len(generated))
             
             # Update .env file
             if self.update_env_file(generated):
-                # Reload environment variables for current process
-                for key, value in generated.items():
-                    os.environ[key] = value
+                # Export to the current process in one update, skipping keys that
+                # already hold the value (each assignment is a putenv call)
+                environ = os.environ
+                os.environ.update({k: v for k, v in generated.items() if environ.get(k) != v})
                     
-                print("✅ Environment variables updated successfully")
+                logger.info("✅ Environment variables updated successfully")
                 return True
             else:
-                print("❌ Failed to update .env file")
+                logger.error("❌ Failed to update .env file")
                 return False
         else:
-            print("✅ All environment variables are already secure")
+            logger.info("✅ All environment variables are already secure")
             return True
 
 
+@lru_cache(maxsize=8)
+def _parse_env_bytes(raw: bytes) -> Tuple[str, Tuple[Tuple[str, str], ...]]:
+    """Decode and parse .env bytes, memoised on the content itself so every
+    EnvGenerator in the process shares one parse of identical files (a
+    rewrite that keeps inode, mtime and size still changes the key).
+    Returns the normalised text and immutable (key, value) pairs."""
+    # Binary reads skip universal-newline translation, so fold \r\n / \r here
+    data = raw.decode('utf-8')
+    if '\r' in data:
+        data = data.replace('\r\n', '\n').replace('\r', '\n')
+    return data, tuple(EnvGenerator._parse_env_text(data).items())
+
+
 def ensure_secure_environment(env_file_path: Optional[Path] = None) -> bool:
     """Convenience function to ensure secure environment variables.
     
@@ -244,6 +372,7 @@ def ensure_secure_environment(env_file_path: Optional[Path] = None) -> bool:
 
 if __name__ == "__main__":
     # Test the environment generator
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stdout)
     print("🧪 Testing Environment Variable Generator")
     print("=" * 50)
     
@@ -5,22 +5,24 @@ Simple test script for XController bot functionality
 
 import sys
 import os
+from unittest import mock
 sys.path.insert(0, os.path.dirname(__file__))
 
-from bot import TelegramAdminBot
+from testutils import TEST_ENV, isolated_data_dir, stub_client
+
+import bot as bot_module
+from bot import TelegramAdminBot, BannedWordMatcher
 
 def test_banned_words():
     """Test banned words detection"""
     print("Testing banned words functionality...")
     
     # Create a test instance with mock environment
-    os.environ['API_ID'] = '12345'
-    os.environ['API_HASH'] = 'test_hash'
-    os.environ['BOT_TOKEN'] = 'test_token'
-    os.environ['BANNED_WORDS'] = 'spam,scam,virus,hack'
+    os.environ.update(TEST_ENV)
     
     try:
-        bot = TelegramAdminBot()
+        with isolated_data_dir():
+            bot = TelegramAdminBot(client_factory=stub_client)
         
         # Test cases
         test_cases = [
@@ -53,41 +55,60 @@ def test_banned_words():
         print(f"Error during testing: {e}")
         return False
 
+def test_matcher_backends():
+    """Every available scan backend gives the same verdicts in one pass"""
+    print("Testing banned-word matcher backends...")
+    
+    words = {"spam", "scam", "virus", "hack", "a.b"}
+    messages = [
+        "hello world", "this is spam", "spamming is bad", "virus alert",
+        "a.b", "axb", "", "x" * 5000 + "hack",
+    ]
+    expected = [False, True, True, True, True, False, False, True]
+    
+    backends = [("regex", {"ahocorasick": None, "hyperscan": None})]
+    if bot_module.ahocorasick is not None:
+        backends.append(("aho-corasick", {"hyperscan": None}))
+    if bot_module.hyperscan is not None:
+        backends.append(("hyperscan", {}))
+    
+    ok = True
+    for name, disabled in backends:
+        with mock.patch.dict(bot_module.__dict__, disabled):
+            matcher = BannedWordMatcher(words)
+            got = [matcher.scan(m) for m in messages]
+        if got == expected:
+            print(f"✓ {name}")
+        else:
+            print(f"✗ {name}: {got} (expected {expected})")
+            ok = False
+    return ok
+
 def test_initialization():
     """Test bot initialization"""
     print("Testing bot initialization...")
     
-    # Test missing required environment variables
-    old_env = os.environ.copy()
     try:
-        # Clear required env vars
-        for key in ['API_ID', 'API_HASH', 'BOT_TOKEN']:
-            if key in os.environ:
-                del os.environ[key]
-        
-        try:
-            bot = TelegramAdminBot()
-            print("✗ Should have failed with missing environment variables")
-            return False
-        except ValueError as e:
-            print(f"✓ Correctly failed with missing env vars: {e}")
+        # Test missing required environment variables
+        with mock.patch.dict(os.environ, TEST_ENV), isolated_data_dir():
+            for var_name in ('API_ID', 'API_HASH', 'BOT_TOKEN'):
+                os.environ.pop(var_name, None)
+            try:
+                bot = TelegramAdminBot(client_factory=stub_client)
+                print("✗ Should have failed with missing environment variables")
+                return False
+            except ValueError as e:
+                print(f"✓ Correctly failed with missing env vars: {e}")
             
-        # Restore and test valid initialization
-        os.environ['API_ID'] = '12345'
-        os.environ['API_HASH'] = 'test_hash'
-        os.environ['BOT_TOKEN'] = 'test_token'
-        
-        bot = TelegramAdminBot()
-        print("✓ Successfully initialized with valid environment variables")
-        return True
+        # Test valid initialization
+        with mock.patch.dict(os.environ, TEST_ENV), isolated_data_dir():
+            bot = TelegramAdminBot(client_factory=stub_client)
+            print("✓ Successfully initialized with valid environment variables")
+            return True
         
     except Exception as e:
         print(f"✗ Unexpected error: {e}")
         return False
-    finally:
-        # Restore original environment
-        os.environ.clear()
-        os.environ.update(old_env)
 
 def main():
     """Run all tests"""
@@ -96,7 +117,8 @@ def main():
     
     tests = [
         test_initialization,
-        test_banned_words
+        test_banned_words,
+        test_matcher_backends
     ]
     
     passed = 0
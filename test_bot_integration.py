@@ -7,6 +7,7 @@ import os
 import sys
 import tempfile
 from pathlib import Path
+from unittest import mock
 
 # Add current directory to path for imports
 sys.path.insert(0, os.path.dirname(__file__))
@@ -35,80 +36,84 @@ BANNED_WORDS=spam,scam
         
         # Change to temporary directory to test
         original_cwd = os.getcwd()
-        try:
-            os.chdir(temp_path)
-            
-            # Test the environment generation part of bot initialization
-            from env_generator import ensure_secure_environment
-            
-            print("  🔍 Running environment security check...")
-            success = ensure_secure_environment()
-            
-            if not success:
-                print("  ❌ Environment security check failed")
-                return False
-            
-            # Verify the .env file was updated
-            updated_content = env_file.read_text()
-            
-            # Check that invalid values were replaced
-            tests = [
-                ('change_this_to_a_strong_random_passphrase', False, 'DB_PASSPHRASE placeholder removed'),
-                ('your_api_hash_here', True, 'API_HASH placeholder preserved (not auto-generated)'),
-                ('API_ID=123456', True, 'Valid API_ID preserved'),
-                ('# Test configuration', True, 'Comments preserved'),
-            ]
-            
-            all_passed = True
-            for test_value, should_exist, description in tests:
-                exists = test_value in updated_content
-                if exists == should_exist:
-                    print(f"  ✅ {description}")
-                else:
-                    print(f"  ❌ {description} - expected {'present' if should_exist else 'absent'}")
-                    all_passed = False
-            
-            # Check that new secure values were added
-            lines = updated_content.split('\n')
-            secure_vars_found = 0
-            
-            for line in lines:
-                if line.startswith('DB_PASSPHRASE=') and '=' in line:
-                    value = line.split('=', 1)[1]
-                    if len(value) >= 32 and value != 'change_this_to_a_strong_random_passphrase':
-                        print(f"  ✅ DB_PASSPHRASE updated with secure value ({len(value)} chars)")
-                        secure_vars_found += 1
+        # Secure values already in the process env would skip the rewrite
+        with mock.patch.dict(os.environ):
+            for var_name in ('DB_PASSPHRASE', 'SALT'):
+                os.environ.pop(var_name, None)
+            try:
+                os.chdir(temp_path)
+                
+                # Test the environment generation part of bot initialization
+                from env_generator import ensure_secure_environment
+                
+                print("  🔍 Running environment security check...")
+                success = ensure_secure_environment()
+                
+                if not success:
+                    print("  ❌ Environment security check failed")
+                    return False
+                
+                # Verify the .env file was updated
+                updated_content = env_file.read_text()
+                
+                # Check that invalid values were replaced
+                tests = [
+                    ('change_this_to_a_strong_random_passphrase', False, 'DB_PASSPHRASE placeholder removed'),
+                    ('your_api_hash_here', True, 'API_HASH placeholder preserved (not auto-generated)'),
+                    ('API_ID=123456', True, 'Valid API_ID preserved'),
+                    ('# Test configuration', True, 'Comments preserved'),
+                ]
+                
+                all_passed = True
+                for test_value, should_exist, description in tests:
+                    exists = test_value in updated_content
+                    if exists == should_exist:
+                        print(f"  ✅ {description}")
                     else:
-                        print(f"  ❌ DB_PASSPHRASE not properly updated")
+                        print(f"  ❌ {description} - expected {'present' if should_exist else 'absent'}")
                         all_passed = False
-                        
-                elif line.startswith('SALT=') and '=' in line:
-                    value = line.split('=', 1)[1]
-                    if len(value) == 64:
-                        try:
-                            int(value, 16)  # Check if valid hex
-                            print(f"  ✅ SALT updated with secure hex value ({len(value)} chars)")
+                
+                # Check that new secure values were added
+                lines = updated_content.split('\n')
+                secure_vars_found = 0
+                
+                for line in lines:
+                    if line.startswith('DB_PASSPHRASE=') and '=' in line:
+                        value = line.split('=', 1)[1]
+                        if len(value) >= 32 and value != 'change_this_to_a_strong_random_passphrase':
+                            print(f"  ✅ DB_PASSPHRASE updated with secure value ({len(value)} chars)")
                             secure_vars_found += 1
-                        except ValueError:
-                            print(f"  ❌ SALT value is not valid hex")
+                        else:
+                            print(f"  ❌ DB_PASSPHRASE not properly updated")
                             all_passed = False
-                    elif len(value) == 0:
-                        print(f"  ❌ SALT was not generated")
-                        all_passed = False
-                    else:
-                        print(f"  ❌ SALT has wrong length: {len(value)}")
-                        all_passed = False
-            
-            if secure_vars_found == 2:
-                print(f"  ✅ All {secure_vars_found} security variables updated")
-            else:
-                print(f"  ❌ Only {secure_vars_found}/2 security variables updated")
-                all_passed = False
-            
-            return all_passed
-            
-        finally:
-            os.chdir(original_cwd)
+                        
+                    elif line.startswith('SALT=') and '=' in line:
+                        value = line.split('=', 1)[1]
+                        if len(value) == 64:
+                            try:
+                                bytes.fromhex(value)  # Check if valid hex
+                                print(f"  ✅ SALT updated with secure hex value ({len(value)} chars)")
+                                secure_vars_found += 1
+                            except ValueError:
+                                print(f"  ❌ SALT value is not valid hex")
+                                all_passed = False
+                        elif len(value) == 0:
+                            print(f"  ❌ SALT was not generated")
+                            all_passed = False
+                        else:
+                            print(f"  ❌ SALT has wrong length: {len(value)}")
+                            all_passed = False
+                
+                if secure_vars_found == 2:
+                    print(f"  ✅ All {secure_vars_found} security variables updated")
+                else:
+                    print(f"  ❌ Only {secure_vars_found}/2 security variables updated")
+                    all_passed = False
+                
+                return all_passed
+                
+            finally:
+                os.chdir(original_cwd)
 
 
 def test_env_generator_import_in_bot():
@@ -6,6 +6,7 @@ Test script for environment variable auto-generation functionality
 import os
 import sys
 import tempfile
+from unittest import mock
 import shutil
 from pathlib import Path
 
@@ -31,6 +32,7 @@ def test_invalid_value_detection():
         ("SALT", "short", True),  # Too short
         ("SALT", "invalid_hex_value", True),  # Not hex
         ("SALT", "1234567890abcdef1234567890abcdef12345678", False),  # Valid hex, long enough
+        ("SALT", "1234567890abcdef1234567890abcdef1", True),  # Odd length: not decodable to bytes
     ]
     
     passed = 0
@@ -153,17 +155,22 @@ BANNED_WORDS=spam,scam
         # Initialize generator and run security check
         generator = EnvGenerator(env_file)
         
-        # Check which values are invalid
-        invalid_count = 0
-        current_values = generator.load_env_file()
-        for var_name in generator.SECURE_VARS:
-            if generator.is_value_invalid(var_name, current_values.get(var_name, '')):
-                invalid_count += 1
-        
-        print(f"  📊 Found {invalid_count} invalid values")
-        
-        # Generate and update
-        success = generator.ensure_secure_environment()
+        # Secure values already in the process env would skip the rewrite
+        with mock.patch.dict(os.environ):
+            for var_name in generator.SECURE_VARS:
+                os.environ.pop(var_name, None)
+            
+            # Check which values are invalid
+            invalid_count = 0
+            current_values = generator.load_env_file()
+            for var_name in generator.SECURE_VARS:
+                if generator.is_value_invalid(var_name, current_values.get(var_name, '')):
+                    invalid_count += 1
+            
+            print(f"  📊 Found {invalid_count} invalid values")
+            
+            # Generate and update
+            success = generator.ensure_secure_environment()
         
         if success:
             # Verify the file was updated
@@ -209,6 +216,28 @@ BANNED_WORDS=spam,scam
             return False
 
 
+def test_env_fast_path():
+    """Valid secure values already in os.environ skip the .env file entirely."""
+    print("🔄 Testing os.environ fast path...")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        env_file = Path(temp_dir) / '.env'
+        generator = EnvGenerator(env_file)
+        
+        secure_env = {
+            'DB_PASSPHRASE': 'a_secure_passphrase_that_is_long_enough',
+            'SALT': '1234567890abcdef1234567890abcdef',
+        }
+        with mock.patch.dict(os.environ, secure_env):
+            success = generator.ensure_secure_environment()
+        
+        if success and not env_file.exists():
+            print("  ✅ No .env read or written when environment is already secure")
+            return True
+        print("  ❌ Fast path did not short-circuit")
+        return False
+
+
 def main():
     """Run all tests."""
     print("🧪 Environment Variable Generator Tests")
@@ -219,6 +248,7 @@ def main():
         ("Env File Parsing", test_env_file_parsing),
         ("Value Generation", test_value_generation),
         ("Full Environment Update", test_full_env_update),
+        ("Environment Fast Path", test_env_fast_path),
     ]
     
     passed = 0
@@ -6,13 +6,17 @@ Tests all major components without requiring actual Telegram connection
 
 import os
 import sys
-import tempfile
 import asyncio
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from unittest import mock
 
 # Add current directory to path for imports
 sys.path.insert(0, os.path.dirname(__file__))
 
+from testutils import TEST_ENV, TEST_SALT, get_test_db, isolated_data_dir, stub_client
+
 def test_data_directory():
     """Test data directory creation and fallback"""
     print("🗂️  Testing data directory management...")
@@ -36,38 +40,26 @@ def test_database_operations():
     """Test database operations"""
     print("💾 Testing database operations...")
     
-    from bot import DatabaseManager
+    db = get_test_db()
     
-    # Create temporary database
-    with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as tmp:
-        db_path = Path(tmp.name)
+    # Test violation tracking
+    user_id = 12345
+    count1 = db.add_violation(user_id)
+    assert count1 == 1, "First violation should return 1"
     
-    try:
-        db = DatabaseManager(db_path, "test_salt_12345678")
-        
-        # Test violation tracking
-        user_id = 12345
-        count1 = db.add_violation(user_id)
-        assert count1 == 1, "First violation should return 1"
-        
-        count2 = db.add_violation(user_id)
-        assert count2 == 2, "Second violation should return 2"
-        
-        # Test banned words management
-        assert db.add_banned_word("testword"), "Should add banned word"
-        banned_words = db.get_banned_words()
-        assert "testword" in banned_words, "Should contain added word"
-        
-        assert db.remove_banned_word("testword"), "Should remove banned word"
-        banned_words = db.get_banned_words()
-        assert "testword" not in banned_words, "Should not contain removed word"
-        
-        print("   ✅ Database operations working")
-        
-    finally:
-        # Clean up
-        if db_path.exists():
-            db_path.unlink()
+    count2 = db.add_violation(user_id)
+    assert count2 == 2, "Second violation should return 2"
+    
+    # Test banned words management
+    added, existing = db.add_banned_words(["testword"])
+    assert added == ["testword"] and not existing, "Should add banned word"
+    banned_words = db.get_banned_words()
+    assert "testword" in banned_words, "Should contain added word"
+    
+    added, existing = db.add_banned_words(["TestWord"])
+    assert not added and existing == ["testword"], "Should report existing word (case-insensitive)"
+    
+    print("   ✅ Database operations working")
 
 async def test_rate_limiting():
     """Test rate limiting functionality"""
@@ -75,8 +67,11 @@ async def test_rate_limiting():
     
     from bot import TokenBucket
     
-    # Test with small bucket for quick testing
+    # Test with small bucket for quick testing, on a virtual clock
+    clock = [0.0]
     bucket = TokenBucket(capacity=3, refill_rate=10.0)  # Fast refill for testing
+    bucket._now = lambda: clock[0]
+    bucket.last_refill = clock[0]
     
     # Should succeed initially
     for i in range(3):
@@ -87,8 +82,8 @@ async def test_rate_limiting():
     success = await bucket.consume()
     assert not success, "Token consumption should fail when bucket is empty"
     
-    # Wait for partial refill
-    await asyncio.sleep(0.2)  # Should refill 2 tokens
+    # Advance the clock for partial refill (no real sleep)
+    clock[0] += 0.2  # Should refill 2 tokens
     
     # Should succeed again
     success = await bucket.consume()
@@ -101,16 +96,13 @@ def test_banned_words():
     print("🚫 Testing banned words detection...")
     
     # Set up environment for bot
-    os.environ['API_ID'] = '123'
-    os.environ['API_HASH'] = 'test'
-    os.environ['BOT_TOKEN'] = 'test'
-    os.environ['SALT'] = 'test_salt_12345678'
-    os.environ['BANNED_WORDS'] = 'spam,scam,virus'
+    os.environ.update(TEST_ENV)
     
     from bot import TelegramAdminBot
     
-    # Create bot instance (won't connect)
-    bot = TelegramAdminBot()
+    # Create bot instance (no Telegram client needed)
+    with isolated_data_dir():
+        bot = TelegramAdminBot(client_factory=stub_client)
     
     # Test banned word detection
     assert bot.contains_banned_words("This is spam"), "Should detect 'spam'"
@@ -125,61 +117,130 @@ def test_user_id_hashing():
     """Test user ID hashing security"""
     print("🔐 Testing user ID hashing...")
     
-    from bot import DatabaseManager
+    db = get_test_db()
     
-    # Create temporary database
-    with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as tmp:
-        db_path = Path(tmp.name)
+    user_id = 123456789
+    hashed = db.hash_user_id(user_id)
     
+    # Hash should be deterministic
+    assert db.hash_user_id(user_id) == hashed, "Hash should be deterministic"
+    
+    # Hash should be different with different salt
     try:
-        db = DatabaseManager(db_path, "secure_salt_12345678")
-        
-        user_id = 123456789
-        hashed = db.hash_user_id(user_id)
-        
-        # Hash should be deterministic
-        assert db.hash_user_id(user_id) == hashed, "Hash should be deterministic"
-        
-        # Hash should be different with different salt
-        db2 = DatabaseManager(db_path, "different_salt_12345678")
-        assert db2.hash_user_id(user_id) != hashed, "Different salt should produce different hash"
-        
-        # Hash should be hex string of appropriate length (SHA256 = 64 chars)
-        assert len(hashed) == 64, "Hash should be 64 characters (SHA256)"
-        assert all(c in '0123456789abcdef' for c in hashed), "Hash should be hex"
+        db.current_salt = "ffeeddccbbaa99887766554433221100"
+        assert db.hash_user_id(user_id) != hashed, "Different salt should produce different hash"
+    finally:
+        db.current_salt = TEST_SALT
+    
+    # Hash should be a raw 16-byte digest (stored as BLOB primary key)
+    assert isinstance(hashed, bytes), "Hash should be raw bytes"
+    assert len(hashed) == 16, "Hash should be 16 bytes (BLAKE2b-128)"
+    
+    print("   ✅ User ID hashing working")
+
+def _make_legacy_db(path, passphrase):
+    """Pre-versioning schema: hex TEXT user_hash, ISO TEXT timestamps."""
+    from bot import sqlcipher
+    conn = sqlcipher.connect(str(path))
+    conn.execute(f"PRAGMA key='{passphrase}';")
+    conn.executescript("""
+        CREATE TABLE activation_state(id INTEGER PRIMARY KEY CHECK(id=1),
+                                      activated INTEGER NOT NULL, activated_at TEXT NOT NULL);
+        CREATE TABLE salt_state(id INTEGER PRIMARY KEY CHECK(id=1),
+                                salt TEXT NOT NULL, last_rotated_at TEXT NOT NULL);
+        CREATE TABLE banned_words(word TEXT PRIMARY KEY);
+        CREATE TABLE violations(user_hash TEXT PRIMARY KEY, count INTEGER DEFAULT 0, last_violation TEXT);
+        CREATE TABLE dm_spam(user_hash TEXT PRIMARY KEY, count INTEGER DEFAULT 0,
+                             last_seen TEXT, actioned INTEGER DEFAULT 0);
+        INSERT INTO activation_state VALUES (1, 1, '2024-01-02T03:04:05');
+        INSERT INTO salt_state VALUES (1, 'ffeeddccbbaa99887766554433221100', 'not a timestamp');
+        INSERT INTO banned_words VALUES ('legacyword');
+        INSERT INTO violations VALUES ('0123456789abcdef0123456789abcdef', 3, '2024-01-02T03:04:05');
+        INSERT INTO dm_spam VALUES ('0123456789abcdef0123456789abcdef', 2, '2024-01-02T03:04:05', 1);
+    """)
+    conn.commit()
+    conn.close()
+
+def test_schema_migration():
+    """Test upgrading a legacy database, and rollback of a failed upgrade"""
+    print("🧱 Testing schema migration...")
+    
+    from bot import DatabaseManager, SCHEMA_VERSION, sqlcipher
+    passphrase = "test_passphrase"
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = Path(temp_dir) / "legacy.db"
+        _make_legacy_db(path, passphrase)
         
-        print("   ✅ User ID hashing working")
+        # A failure part-way through leaves the legacy schema untouched
+        broken = dict(DatabaseManager._TABLES, salt_state="CREATE TABLE salt_state(")
+        with mock.patch.object(DatabaseManager, "_TABLES", broken):
+            try:
+                DatabaseManager(path, passphrase, None, True)
+                raise AssertionError("Broken upgrade should raise")
+            except sqlcipher.DatabaseError:
+                pass
+        conn = sqlcipher.connect(str(path))
+        conn.execute(f"PRAGMA key='{passphrase}';")
+        tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        assert not any(t.endswith("_v1") for t in tables), "Failed upgrade should leave no renamed tables"
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == 0, "Version should be unchanged"
+        assert conn.execute("SELECT activated_at FROM activation_state").fetchone()[0] == '2024-01-02T03:04:05'
+        assert conn.execute("SELECT count(*) FROM violations").fetchone()[0] == 1, "Rows should survive rollback"
+        conn.close()
         
-    finally:
-        # Clean up
-        if db_path.exists():
-            db_path.unlink()
+        # The real upgrade keeps state rows and converts their timestamps
+        db = DatabaseManager(path, passphrase, None, True)
+        try:
+            cur = db._connect().cursor()
+            assert cur.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+            assert cur.execute("SELECT activated, activated_at FROM activation_state").fetchone() == (1, 1704164645)
+            assert db.current_salt == 'ffeeddccbbaa99887766554433221100', "Salt should survive the upgrade"
+            rotated_at = cur.execute("SELECT last_rotated_at FROM salt_state").fetchone()[0]
+            assert isinstance(rotated_at, int), "Unparseable timestamp should become an integer"
+            assert db.get_banned_words() == {"legacyword"}, "Banned words should survive the upgrade"
+            assert cur.execute("SELECT count(*) FROM violations").fetchone()[0] == 0
+            assert db.add_violation(42) == 1, "Recreated violations table should accept BLOB hashes"
+        finally:
+            db.close()
+    
+    print("   ✅ Schema migration working")
+
+# Tests sharing state run in order within a group, on one worker thread (the
+# shared in-memory DB connection is bound to the thread that opened it);
+# groups are independent and run concurrently.
+TEST_GROUPS = [
+    [("Data Directory", test_data_directory)],
+    [("Database Operations", test_database_operations), ("User ID Hashing", test_user_id_hashing)],
+    [("Rate Limiting", test_rate_limiting)],
+    [("Banned Words", test_banned_words)],
+    [("Schema Migration", test_schema_migration)],
+]
+
+async def _run_group(group):
+    """Run one group's tests in order; returns how many passed."""
+    loop = asyncio.get_running_loop()
+    passed = 0
+    with ThreadPoolExecutor(max_workers=1) as worker:
+        for test_name, test_func in group:
+            try:
+                if asyncio.iscoroutinefunction(test_func):
+                    await test_func()
+                else:
+                    await loop.run_in_executor(worker, test_func)
+                passed += 1
+            except Exception as e:
+                print(f"   ❌ {test_name} failed: {e}")
+    return passed
 
 async def main():
     """Run all integration tests"""
     print("🧪 XController Integration Tests")
     print("=" * 50)
     
-    tests = [
-        ("Data Directory", test_data_directory),
-        ("Database Operations", test_database_operations),
-        ("Rate Limiting", test_rate_limiting),
-        ("Banned Words", test_banned_words),
-        ("User ID Hashing", test_user_id_hashing),
-    ]
-    
-    passed = 0
-    total = len(tests)
-    
-    for test_name, test_func in tests:
-        try:
-            if asyncio.iscoroutinefunction(test_func):
-                await test_func()
-            else:
-                test_func()
-            passed += 1
-        except Exception as e:
-            print(f"   ❌ {test_name} failed: {e}")
+    results = await asyncio.gather(*(_run_group(group) for group in TEST_GROUPS))
+    passed = sum(results)
+    total = sum(len(group) for group in TEST_GROUPS)
     
     print("\n" + "=" * 50)
     print(f"Integration Tests: {passed}/{total} passed")
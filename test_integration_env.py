@@ -9,6 +9,17 @@ import sys
 # Add current directory to path for imports
 sys.path.insert(0, os.path.dirname(__file__))
 
+_shared_generator = None
+
+def get_generator():
+    """EnvGenerator shared by the tests in this file; load_env_file() re-reads
+    the .env only when it changed on disk."""
+    global _shared_generator
+    if _shared_generator is None:
+        from env_generator import EnvGenerator
+        _shared_generator = EnvGenerator()
+    return _shared_generator
+
 def test_env_integration():
     """Test the environment variable integration without external dependencies."""
     print("🧪 Testing Environment Variable Integration")
@@ -24,7 +35,7 @@ def test_env_integration():
     
     # Test 2: Check current .env file status
     print("\n🔍 Checking current .env file status...")
-    generator = EnvGenerator()
+    generator = get_generator()
     current_values = generator.load_env_file()
     
     print(f"📊 Found {len(current_values)} environment variables in .env")
@@ -53,7 +64,7 @@ def test_env_integration():
     
     # Test 5: Verify all values are now secure
     print("\n🔍 Verifying all values are now secure...")
-    generator_check = EnvGenerator()
+    generator_check = get_generator()
     new_values = generator_check.load_env_file()
     
     all_secure = True
@@ -79,8 +90,7 @@ def test_dotenv_independence():
     
     # The env_generator should work even without python-dotenv installed
     try:
-        from env_generator import EnvGenerator
-        generator = EnvGenerator()
+        generator = get_generator()
         
         # Load .env file manually (without dotenv)
         values = generator.load_env_file()
@@ -101,8 +111,7 @@ def test_placeholder_detection():
     """Test detection of placeholder values that should be replaced."""
     print("\n🔍 Testing placeholder value detection...")
     
-    from env_generator import EnvGenerator
-    generator = EnvGenerator()
+    generator = get_generator()
     
     test_cases = [
         ('DB_PASSPHRASE', 'change_this_to_a_strong_random_passphrase', True),
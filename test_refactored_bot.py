@@ -6,53 +6,65 @@ Tests the new single-group focus and dynamic banned words management
 
 import os
 import sys
-import tempfile
 import asyncio
-from pathlib import Path
+from functools import lru_cache
+from unittest.mock import AsyncMock, MagicMock
 from datetime import datetime, timedelta
 
 # Add current directory to path for imports
 sys.path.insert(0, os.path.dirname(__file__))
 
+from testutils import TEST_ENV, get_test_db, isolated_data_dir, stub_client
+
+# Every environment variable TelegramAdminBot reads at construction
+_BOT_ENV_KEYS = (
+    'API_ID', 'API_HASH', 'BOT_TOKEN', 'ALLOWED_GROUP_ID', 'SALT', 'DB_PASSPHRASE',
+    'ADMIN_USER_IDS', 'DM_SPAM_THRESHOLD', 'DM_SPAM_WINDOW_DAYS', 'BANNED_WORDS',
+)
+
+@lru_cache(maxsize=None)
+def _build_bot(env_key):
+    # env_key only keys the cache; the bot reads os.environ itself. Its
+    # database sits in an isolated data directory, never the real DATA_DIR.
+    from bot import TelegramAdminBot
+    with isolated_data_dir():
+        return TelegramAdminBot(client_factory=stub_client)
+
+def get_test_bot():
+    """TelegramAdminBot for the current environment, constructed once per
+    distinct configuration (DB open, word loading and client setup are the
+    expensive part). Its tables are reset to the environment's banned words
+    on every call, as a freshly constructed bot would have them."""
+    bot = _build_bot(tuple(os.environ.get(k) for k in _BOT_ENV_KEYS))
+    bot.db._connect().executescript("DELETE FROM violations; DELETE FROM banned_words;")
+    bot.db.load_initial_banned_words(
+        {w for w in os.environ.get("BANNED_WORDS", "").split(",") if w.strip()}
+    )
+    bot.banned_words = bot.db.get_banned_words()
+    return bot
+
 def test_banned_words_database():
     """Test dynamic banned words management in database"""
     print("🔄 Testing dynamic banned words management...")
     
-    from bot import DatabaseManager
-    
-    # Create temporary database
-    with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as tmp:
-        db_path = Path(tmp.name)
-    
     try:
-        db = DatabaseManager(db_path, "test_salt_12345678")
+        db = get_test_db()
         
-        # Test adding banned words
-        assert db.add_banned_word("spam"), "Should add new word 'spam'"
-        assert db.add_banned_word("scam"), "Should add new word 'scam'"
-        assert not db.add_banned_word("spam"), "Should not add duplicate word 'spam'"
+        # Test adding banned words (one transaction for the batch)
+        added, existing = db.add_banned_words(["spam", "scam", "spam"])
+        assert added == ["spam", "scam"], f"Should add new words, got {added}"
+        assert existing == ["spam"], "Should not add duplicate word 'spam'"
         
         # Test getting banned words
         banned_words = db.get_banned_words()
-        assert "spam" in banned_words, "Should contain 'spam'"
-        assert "scam" in banned_words, "Should contain 'scam'"
-        assert len(banned_words) == 2, f"Should have 2 words, got {len(banned_words)}"
-        
-        # Test removing banned words
-        assert db.remove_banned_word("spam"), "Should remove 'spam'"
-        assert not db.remove_banned_word("spam"), "Should not remove non-existent 'spam'"
-        
-        banned_words = db.get_banned_words()
-        assert "spam" not in banned_words, "Should not contain 'spam' after removal"
-        assert "scam" in banned_words, "Should still contain 'scam'"
+        assert banned_words == {"spam", "scam"}, f"Should hold exactly spam and scam, got {banned_words}"
         
         # Test loading initial banned words
         initial_words = {"virus", "hack", "test"}
         db.load_initial_banned_words(initial_words)
         
-        banned_words = db.get_banned_words()
-        for word in initial_words:
-            assert word in banned_words, f"Should contain initial word '{word}'"
+        missing = initial_words - db.get_banned_words()
+        assert not missing, f"Should contain initial words {missing}"
         
         print("   ✅ Dynamic banned words management working")
         return True
@@ -60,25 +72,13 @@ def test_banned_words_database():
     except Exception as e:
         print(f"   ❌ Failed: {e}")
         return False
-    finally:
-        # Cleanup
-        try:
-            db_path.unlink()
-        except:
-            pass
 
 def test_violation_reset_logic():
     """Test 7-day violation reset logic"""
     print("🔄 Testing violation reset logic...")
     
-    from bot import DatabaseManager
-    
-    # Create temporary database
-    with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as tmp:
-        db_path = Path(tmp.name)
-    
     try:
-        db = DatabaseManager(db_path, "test_salt_12345678")
+        db = get_test_db()
         
         user_id = 12345
         
@@ -91,17 +91,8 @@ def test_violation_reset_logic():
         assert count2 == 2, f"Second violation should return 2, got {count2}"
         
         # Simulate old violation by manually updating the timestamp
-        import sqlite3
-        user_hash = db.hash_user_id(user_id)
-        old_date = datetime.now() - timedelta(days=8)  # 8 days ago
-        
-        with sqlite3.connect(db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                UPDATE violations SET last_violation = ?, count = 1
-                WHERE user_hash = ?
-            ''', (old_date, user_hash))
-            conn.commit()
+        old_date = int((datetime.now() - timedelta(days=8)).timestamp())  # 8 days ago
+        db._debug_set_violation_time(user_id, old_date)
         
         # Test violation after 7+ days should reset
         count_after_reset = db.add_violation(user_id)
@@ -113,34 +104,21 @@ def test_violation_reset_logic():
     except Exception as e:
         print(f"   ❌ Failed: {e}")
         return False
-    finally:
-        # Cleanup
-        try:
-            db_path.unlink()
-        except:
-            pass
 
 def test_bot_initialization_with_banned_words():
     """Test bot initialization with banned words from environment and database"""
     print("🔄 Testing bot initialization with banned words...")
     
     # Set up environment for bot
-    os.environ['API_ID'] = '123'
-    os.environ['API_HASH'] = 'test'
-    os.environ['BOT_TOKEN'] = 'test'
-    os.environ['SALT'] = 'test_salt_12345678'
-    os.environ['BANNED_WORDS'] = 'spam,scam,virus'
+    os.environ.update(TEST_ENV)
     
     try:
-        from bot import TelegramAdminBot
-        
         # Create bot instance (won't connect)
-        bot = TelegramAdminBot()
+        bot = get_test_bot()
         
         # Check that banned words from environment are loaded
-        assert "spam" in bot.banned_words, "Should contain 'spam' from environment"
-        assert "scam" in bot.banned_words, "Should contain 'scam' from environment"
-        assert "virus" in bot.banned_words, "Should contain 'virus' from environment"
+        missing = {"spam", "scam", "virus"} - bot.banned_words
+        assert not missing, f"Should contain {missing} from environment"
         
         # Test banned word detection
         assert bot.contains_banned_words("This is spam"), "Should detect 'spam'"
@@ -148,7 +126,8 @@ def test_bot_initialization_with_banned_words():
         assert not bot.contains_banned_words("Hello world"), "Should not detect normal text"
         
         # Test adding a new banned word via database
-        assert bot.db.add_banned_word("newword"), "Should add new word via database"
+        added, _ = bot.db.add_banned_words(["newword"])
+        assert added == ["newword"], "Should add new word via database"
         
         # Refresh banned words and test
         bot.banned_words = bot.db.get_banned_words()
@@ -167,33 +146,27 @@ async def test_orwell_command_parsing():
     print("🔄 Testing /orwell command parsing...")
     
     # Set up environment for bot
-    os.environ['API_ID'] = '123'
-    os.environ['API_HASH'] = 'test'
-    os.environ['BOT_TOKEN'] = 'test'
-    os.environ['SALT'] = 'test_salt_12345678'
-    os.environ['BANNED_WORDS'] = 'spam,scam'
+    os.environ.update(TEST_ENV)
     
     try:
-        from bot import TelegramAdminBot
-        
-        # Create bot instance
-        bot = TelegramAdminBot()
+        # Same configuration as the initialization test: reuses its bot
+        bot = get_test_bot()
         
-        # Test command parsing by checking method exists
-        assert hasattr(bot, 'handle_orwell_command'), "Should have handle_orwell_command method"
-        
-        # Test database operations that the command would use
         initial_count = len(bot.db.get_banned_words())
+        event = MagicMock()
+        event.reply = AsyncMock()
         
-        # Test add operation
-        bot.db.add_banned_word("testword")
-        new_count = len(bot.db.get_banned_words())
-        assert new_count == initial_count + 1, "Should increase count after adding word"
+        # Comma-separated payload: one new word, one already banned
+        await bot.handle_orwell(event, "/orwell testword, SPAM")
+        event.reply.assert_awaited_once_with("Added: testword | Skipped: spam")
+        assert len(bot.db.get_banned_words()) == initial_count + 1, "Should add exactly one word"
+        assert "testword" in bot.banned_words, "Matcher should pick up the new word"
+        assert bot.contains_banned_words("a TESTWORD here"), "Should detect the new word"
         
-        # Test remove operation
-        bot.db.remove_banned_word("testword")
-        final_count = len(bot.db.get_banned_words())
-        assert final_count == initial_count, "Should return to original count after removing word"
+        # Missing payload only replies with usage
+        event.reply.reset_mock()
+        await bot.handle_orwell(event, "/orwell")
+        event.reply.assert_awaited_once_with("Usage: /orwell word OR /orwell word1,word2,word3")
         
         print("   ✅ /orwell command structure working")
         return True
@@ -202,33 +175,43 @@ async def test_orwell_command_parsing():
         print(f"   ❌ Failed: {e}")
         return False
 
-async def main():
+TESTS = [
+    ("Banned Words Database", test_banned_words_database),
+    ("Violation Reset Logic", test_violation_reset_logic),
+    ("Bot Initialization", test_bot_initialization_with_banned_words),
+    ("Orwell Command", test_orwell_command_parsing),
+]
+# Partitioned once: an event loop is only started if there are async tests
+SYNC_TESTS = [t for t in TESTS if not asyncio.iscoroutinefunction(t[1])]
+ASYNC_TESTS = [t for t in TESTS if asyncio.iscoroutinefunction(t[1])]
+
+async def _run_async_tests():
+    passed = 0
+    for test_name, test_func in ASYNC_TESTS:
+        print(f"\n{test_name}:")
+        try:
+            if await test_func():
+                passed += 1
+        except Exception as e:
+            print(f"   ❌ Failed with error: {e}")
+    return passed
+
+def main():
     """Run all tests"""
     print("🧪 Refactored XController Tests")
     print("=" * 50)
     
-    tests = [
-        ("Banned Words Database", test_banned_words_database),
-        ("Violation Reset Logic", test_violation_reset_logic),
-        ("Bot Initialization", test_bot_initialization_with_banned_words),
-        ("Orwell Command", test_orwell_command_parsing),
-    ]
-    
     passed = 0
-    total = len(tests)
-    
-    for test_name, test_func in tests:
+    for test_name, test_func in SYNC_TESTS:
         print(f"\n{test_name}:")
         try:
-            if asyncio.iscoroutinefunction(test_func):
-                result = await test_func()
-            else:
-                result = test_func()
-            
-            if result:
+            if test_func():
                 passed += 1
         except Exception as e:
             print(f"   ❌ Failed with error: {e}")
+    if ASYNC_TESTS:
+        passed += asyncio.run(_run_async_tests())
+    total = len(TESTS)
     
     print("\n" + "=" * 50)
     print(f"Tests: {passed}/{total} passed")
@@ -241,5 +224,4 @@ async def main():
         return 1
 
 if __name__ == '__main__':
-    exit_code = asyncio.run(main())
-    sys.exit(exit_code)
\ No newline at end of file
+    sys.exit(main())
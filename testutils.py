@@ -0,0 +1,62 @@
+"""
+Shared helpers for the test scripts (and conftest.py)
+
+Each test_*.py still runs on its own (`python test_x.py`), so these are plain
+functions and constants rather than pytest fixtures.
+"""
+
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from unittest import mock
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+TEST_SALT = "00112233445566778899aabbccddeeff"
+
+# Environment TelegramAdminBot needs (valid hex SALT, numeric group id)
+TEST_ENV = {
+    "API_ID": "123",
+    "API_HASH": "test",
+    "BOT_TOKEN": "test",
+    "ALLOWED_GROUP_ID": "1001234567890",
+    "DB_PASSPHRASE": "test_passphrase_0123456789",
+    "SALT": TEST_SALT,
+    "BANNED_WORDS": "spam,scam,virus,hack",
+}
+
+def stub_client(*args, **kwargs):
+    """client_factory for tests that never talk to Telegram (no session file)."""
+    return MagicMock()
+
+_data_root = None
+
+@contextmanager
+def isolated_data_dir():
+    """Point bot.DATA_DIR (database and session files) at a fresh, empty
+    directory, so no test opens or keys the real ./data/bot.enc.db.
+
+    Directories live under one temporary root removed at interpreter exit,
+    so a bot built inside the block may keep using its database afterwards."""
+    global _data_root
+    import bot as bot_module
+    if _data_root is None:
+        _data_root = tempfile.TemporaryDirectory(prefix="alphacontrolbot-test-")
+    with mock.patch.object(bot_module, "DATA_DIR", Path(tempfile.mkdtemp(dir=_data_root.name))):
+        yield
+
+_shared_db = None
+
+def get_test_db():
+    """In-memory DatabaseManager shared by the DB tests of this process
+    (schema set up once), emptied before each test instead of being recreated.
+    The connection belongs to the thread that first asks for it."""
+    global _shared_db
+    if _shared_db is None:
+        from bot import DatabaseManager
+        _shared_db = DatabaseManager(None, "test_passphrase", TEST_SALT, False, in_memory=True)
+    _shared_db._connect().executescript("DELETE FROM violations; DELETE FROM banned_words;")
+    return _shared_db